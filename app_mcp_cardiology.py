@@ -3,18 +3,26 @@ Combined Streamlit App: Night Cardiology Sentinel + MCP Client
 Tabs for both the standalone analyzer and the MCP ReAct loop visualization
 """
 
+import io
 import json
 import sys
 import os
 import re
 import asyncio
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from datetime import datetime
 
 import streamlit as st
 from dotenv import load_dotenv
 
+# Optional: faster parsing of uploaded subjects_info.json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Add src directory to path - updated for root location
 src_path = Path(__file__).parent / "src" / "mcp_architecture"
 if str(src_path) not in sys.path:
@@ -101,7 +109,8 @@ def render_subject_selector() -> SubjectInfo:
             st.info("Upload a JSON file to continue.")
             return SubjectInfo(None, None, None, None, None)
         
-        data = json.loads(uploaded.read().decode("utf-8"))
+        raw = uploaded.read()
+        data = orjson.loads(raw) if ORJSON_AVAILABLE else json.loads(raw.decode("utf-8"))
         if not isinstance(data, list):
             st.error("Expected a JSON array of subjects.")
             return SubjectInfo(None, None, None, None, None)
@@ -192,6 +201,19 @@ def render_model_selector() -> tuple:
     return model_source, local_path, hf_repo, hf_filename, int(n_ctx), int(max_tokens)
 
 
+@st.cache_data(show_spinner=False, max_entries=16)
+def summarize_vitals_file(data: bytes, window_mode: str) -> Tuple[int, List[Tuple[int, str]]]:
+    """Parse an uploaded vitals file into its row count and (rows, summary) per window.
+
+    Cached on the file content and windowing mode, so Streamlit reruns skip the parse.
+    """
+    # Stream lines from the buffer instead of decoding and splitting the whole file
+    lines = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", errors="ignore")
+    rows = parse_vitals_lines(lines)
+    windows = chunk_rows(rows, window_mode)
+    return len(rows), [(len(window), summarize_window(window)) for window in windows]
+
+
 def run_cardiology_analyzer():
     """Run the standalone Night Cardiology Sentinel analyzer."""
     st.title("🏥 Night Cardiology Sentinel - Standalone Analyzer")
@@ -232,15 +254,13 @@ def run_cardiology_analyzer():
 
         # Parse vitals
         with st.spinner("Parsing vitals data..."):
-            lines = vitals_file.read().decode("utf-8", errors="ignore").splitlines()
-            rows = parse_vitals_lines(lines)
+            row_count, windows = summarize_vitals_file(vitals_file.getvalue(), window_mode)
         
-        if not rows:
+        if not row_count:
             st.error("No vitals rows parsed. Check the file format.")
             return
 
-        windows = chunk_rows(rows, window_mode)
-        st.success(f"✅ Parsed {len(rows)} rows into {len(windows)} windows.")
+        st.success(f"✅ Parsed {row_count} rows into {len(windows)} windows.")
 
         # Load model
         try:
@@ -258,15 +278,14 @@ def run_cardiology_analyzer():
         st.subheader("🔍 Analysis Results")
         progress_bar = st.progress(0.0, text="Analyzing windows...")
         
-        for idx, window_rows in enumerate(windows, start=1):
-            window_summary = summarize_window(window_rows)
+        for idx, (window_size, window_summary) in enumerate(windows, start=1):
             prompt = build_prompt(subject, window_summary)
             
             with st.spinner(f"Analyzing window {idx}/{len(windows)}..."):
                 response_text = sentinel.predict(prompt, max_tokens=max_tokens)
             
             # Display results
-            with st.expander(f"**Window {idx}** - {len(window_rows)} rows", expanded=True):
+            with st.expander(f"**Window {idx}** - {window_size} rows", expanded=True):
                 col1, col2 = st.columns([1, 2])
                 with col1:
                     st.markdown("**Window Summary:**")
@@ -7,12 +7,21 @@ This app allows users to:
 - Generate clinical insights using a quantized MedGemma model (local or HF)
 """
 
+import io
 import json
 import sys
 from pathlib import Path
+from typing import List, Tuple
 
 import streamlit as st
 
+# Optional: faster parsing of uploaded subjects_info.json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Add src to path so we can import night_cardiology_sentinel
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
@@ -26,6 +35,19 @@ from night_cardiology_sentinel import (
 )
 
 
+@st.cache_data(show_spinner=False, max_entries=16)
+def summarize_vitals_file(data: bytes, window_mode: str) -> Tuple[int, List[Tuple[int, str]]]:
+    """Parse an uploaded vitals file into its row count and (rows, summary) per window.
+
+    Cached on the file content and windowing mode, so Streamlit reruns skip the parse.
+    """
+    # Stream lines from the buffer instead of decoding and splitting the whole file
+    lines = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", errors="ignore")
+    rows = parse_vitals_lines(lines)
+    windows = chunk_rows(rows, window_mode)
+    return len(rows), [(len(window), summarize_window(window)) for window in windows]
+
+
 def render_subject_selector() -> SubjectInfo:
     """Render UI for selecting or entering subject information."""
     st.subheader("📋 Subject selection")
@@ -41,7 +63,8 @@ def render_subject_selector() -> SubjectInfo:
             st.info("Upload a JSON file to continue.")
             return SubjectInfo(None, None, None, None, None)
         
-        data = json.loads(uploaded.read().decode("utf-8"))
+        raw = uploaded.read()
+        data = orjson.loads(raw) if ORJSON_AVAILABLE else json.loads(raw.decode("utf-8"))
         if not isinstance(data, list):
             st.error("Expected a JSON array of subjects.")
             return SubjectInfo(None, None, None, None, None)
@@ -181,15 +204,13 @@ def main() -> None:
 
         # Parse vitals
         with st.spinner("Parsing vitals data..."):
-            lines = vitals_file.read().decode("utf-8", errors="ignore").splitlines()
-            rows = parse_vitals_lines(lines)
+            row_count, windows = summarize_vitals_file(vitals_file.getvalue(), window_mode)
         
-        if not rows:
+        if not row_count:
             st.error("No vitals rows parsed. Check the file format.")
             return
 
-        windows = chunk_rows(rows, window_mode)
-        st.success(f"✅ Parsed {len(rows)} rows into {len(windows)} windows.")
+        st.success(f"✅ Parsed {row_count} rows into {len(windows)} windows.")
 
         # Load model
         try:
@@ -207,15 +228,14 @@ def main() -> None:
         st.subheader("🔍 Analysis Results")
         progress_bar = st.progress(0.0, text="Analyzing windows...")
         
-        for idx, window_rows in enumerate(windows, start=1):
-            window_summary = summarize_window(window_rows)
+        for idx, (window_size, window_summary) in enumerate(windows, start=1):
             prompt = build_prompt(subject, window_summary)
             
             with st.spinner(f"Analyzing window {idx}/{len(windows)}..."):
                 response_text = sentinel.predict(prompt, max_tokens=max_tokens)
             
             # Display results
-            with st.expander(f"**Window {idx}** - {len(window_rows)} rows", expanded=True):
+            with st.expander(f"**Window {idx}** - {window_size} rows", expanded=True):
                 col1, col2 = st.columns([1, 2])
                 with col1:
                     st.markdown("**Window Summary:**")
@@ -1604,7 +1604,7 @@ with tab_day:
             # Debug accordion
             with st.expander("🔍 Debug Info", expanded=False):
                 st.code(f"Patient folder: data/patients/{patient_id}")
-                st.code(f"Night log file: data/patients/{patient_id}/night_log.json")
+                st.code(f"Night log file: data/patients/{patient_id}/night_log.jsonl")
                 st.write(f"Events loaded: {len(night_events) if night_events else 0}")
                 if night_events:
                     st.json(night_events)
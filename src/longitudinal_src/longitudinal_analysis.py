@@ -3,27 +3,30 @@ MedGemma Longitudinal Analysis Module
 Handles longitudinal patient data analysis and report generation
 """
 
-import pdfplumber
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+# Les dépendances lourdes (pdfplumber, plotly, reportlab) sont importées
+# dans les fonctions qui les utilisent pour garder un import du module léger.
 import re
 import datetime
 import json
 import os
 from io import BytesIO
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer, PageBreak
-from reportlab.lib import colors
-from reportlab.lib.units import inch
 from collections import defaultdict
 import textwrap
+import zlib
 from pathlib import Path
 
+try:
+    import diskcache
+    DISKCACHE_AVAILABLE = True
+except ImportError:
+    DISKCACHE_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Mapping de gravité
 SEVERITY_MAP = {"Elevee": 3, "High": 3, "Moyenne": 2, "Medium": 2, "Basse": 1, "Low": 1, "None": 0, "": 0}
 SEVERITY_COLORS = {
@@ -33,6 +36,16 @@ SEVERITY_COLORS = {
     "None": "gray", "": "gray"
 }
 
+# Détection des alertes critiques (insensible à la casse, sans copie du texte)
+CRITICAL_ALERTS_RE = re.compile(r"(?i:alertes critiques)|■■ ATTENTION")
+
+# Cache disque des PDF déjà parsés (clé: chemin, mtime, taille)
+PDF_CACHE_DIR = os.environ.get(
+    "MEDGEMMA_PDF_CACHE_DIR",
+    str(Path.home() / ".cache" / "medgemma_sentinel" / "parsed_pdfs")
+)
+_pdf_cache = None
+
 
 def load_medgemma_model(model_path: str):
     """Charge le modèle MedGemma local"""
@@ -51,8 +64,63 @@ def load_medgemma_model(model_path: str):
         return None
 
 
+def _get_pdf_cache():
+    """Ouvre (une seule fois) le cache disque des PDF parsés"""
+    global _pdf_cache
+    if _pdf_cache is None and DISKCACHE_AVAILABLE:
+        try:
+            _pdf_cache = diskcache.Cache(PDF_CACHE_DIR, disk_pickle_protocol=5)
+        except Exception as e:
+            print(f"PDF cache disabled: {str(e)}")
+    return _pdf_cache
+
+
+def _pdf_cache_key(pdf_path):
+    """Clé de cache: (chemin absolu, mtime_ns, taille)"""
+    st = os.stat(pdf_path)
+    return (os.path.abspath(pdf_path), st.st_mtime_ns, st.st_size)
+
+
 def extract_medical_data(pdf_path):
-    """Extrait les données médicales structurées du PDF"""
+    """Extrait les données médicales structurées du PDF
+
+    Les résultats sont mis en cache sur disque (si diskcache est installé):
+    un PDF inchangé n'est pas re-parsé par pdfplumber.
+    """
+    cache = _get_pdf_cache()
+    if cache is None:
+        return _parse_medical_pdf(pdf_path)
+    
+    key = _pdf_cache_key(pdf_path)
+    cached = cache.get(key)
+    if cached is not None:
+        data = dict(cached)
+        data["raw_text"] = zlib.decompress(data["raw_text"]).decode("utf-8")
+        return data
+    
+    data = _parse_medical_pdf(pdf_path)
+    stored = dict(data)
+    stored["raw_text"] = zlib.compress(data["raw_text"].encode("utf-8"), 1)
+    cache.set(key, stored)
+    return data
+
+
+def _fast_datetime(date_str, time_str):
+    """Construit un datetime depuis 'JJ/MM/AAAA' et 'HH:MM' sans strptime
+
+    Les deux formats sont garantis par les regex d'extraction, un découpage
+    direct suffit donc (bien plus rapide que datetime.strptime).
+    """
+    return datetime.datetime(
+        int(date_str[6:10]), int(date_str[3:5]), int(date_str[0:2]),
+        int(time_str[0:2]), int(time_str[3:5])
+    )
+
+
+def _parse_medical_pdf(pdf_path):
+    """Parse un PDF médical avec pdfplumber (sans cache)"""
+    import pdfplumber
+    
     with pdfplumber.open(pdf_path) as pdf:
         text = ""
         for page in pdf.pages:
@@ -164,15 +232,13 @@ def extract_medical_data(pdf_path):
         data["management_plan"] = plan_items
     
     # Critical alerts
-    data["critical_alerts"] = "alertes critiques" in text.lower() or "■■ ATTENTION" in text
+    data["critical_alerts"] = CRITICAL_ALERTS_RE.search(text) is not None
     
     # Full date for sorting
     if data["date"] and data["time"]:
         try:
-            data["full_date"] = datetime.datetime.strptime(
-                f"{data['date']} {data['time']}", "%d/%m/%Y %H:%M"
-            )
-        except:
+            data["full_date"] = _fast_datetime(data["date"], data["time"])
+        except ValueError:
             pass
     
     return data
@@ -185,14 +251,17 @@ def analyze_longitudinal_evolution(patient_reports, llm_model, analysis_type="co
     """
     
     # Préparer les données pour MedGemma
-    reports_text = ""
+    parts = []
     for i, report in enumerate(patient_reports, 1):
-        reports_text += f"Consultation {i} ({report['date']} {report['time']}):\n"
-        reports_text += f"- Plainte principale: {report['main_complaint'] if report['main_complaint'] else 'Aucune'}\n"
-        reports_text += f"- Symptômes: {', '.join(report['symptoms']) if report['symptoms'] else 'Aucun'}\n"
-        reports_text += f"- Diagnostics: {', '.join(report['diagnoses']) if report['diagnoses'] else 'Aucun'}\n"
-        reports_text += f"- Gravité: {report['severity'] if report['severity'] else 'Non évaluée'}\n"
-        reports_text += f"- Plan: {', '.join(report['management_plan']) if report['management_plan'] else 'Non défini'}\n\n"
+        parts.append(
+            f"Consultation {i} ({report['date']} {report['time']}):\n"
+            f"- Plainte principale: {report['main_complaint'] or 'Aucune'}\n"
+            f"- Symptômes: {', '.join(report['symptoms']) or 'Aucun'}\n"
+            f"- Diagnostics: {', '.join(report['diagnoses']) or 'Aucun'}\n"
+            f"- Gravité: {report['severity'] or 'Non évaluée'}\n"
+            f"- Plan: {', '.join(report['management_plan']) or 'Non défini'}\n\n"
+        )
+    reports_text = "".join(parts)
     
     # Prompt pour l'analyse
     if analysis_type == "comparison":
@@ -229,6 +298,8 @@ Fournis une analyse JSON structurée complète."""
             generated_text = response['choices'][0]['text'].strip()
             json_match = re.search(r'\{.*\}', generated_text, re.DOTALL)
             if json_match:
+                if ORJSON_AVAILABLE:
+                    return orjson.loads(json_match.group())
                 return json.loads(json_match.group())
     except Exception as e:
         print(f"Error during longitudinal analysis: {str(e)}")
@@ -363,6 +434,9 @@ def generate_fallback_longitudinal_analysis(patient_reports, analysis_type="comp
 
 def create_longitudinal_visualizations(patient_reports, analysis):
     """Crée des visualisations longitudinales complètes"""
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    
     
     dates = [report['date'] for report in patient_reports]
     severities = [SEVERITY_MAP.get(report['severity'], 0) for report in patient_reports]
@@ -465,6 +539,12 @@ def create_longitudinal_visualizations(patient_reports, analysis):
 
 def generate_enhanced_report_with_longitudinal_analysis(original_report, longitudinal_analysis, previous_reports, output_path):
     """Génère un rapport PDF amélioré avec l'analyse longitudinale"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer, PageBreak
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+    
     
     doc = SimpleDocTemplate(output_path, pagesize=letter)
     styles = getSampleStyleSheet()
@@ -15,12 +15,89 @@ from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 import ollama
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgspec
+    MSGSPEC_AVAILABLE = True
+    _ARGS_DECODER = msgspec.json.Decoder(dict)
+except ImportError:
+    MSGSPEC_AVAILABLE = False
+
 load_dotenv()
 
+# ReAct output parsing patterns (compiled once, reused every loop iteration)
+ACTION_RE = re.compile(r"Action:\s*(.*?)\n")
+ACTION_INPUT_RE = re.compile(r"Action Input:\s*(.+?)(?:\n\s*\n|\Z)", re.DOTALL)
+FENCE_RE = re.compile(r"```(?:json)?")
+# JSON string literals (escapes included) are matched whole so braces inside them are not counted
+BRACE_RE = re.compile(r'"(?:[^"\\]|\\.)*"|[{}]')
+
+
+def _balanced_end(text: str, start: int) -> int:
+    """End index of the {...} object opening at text[start], -1 if it is not closed yet."""
+    depth = 0
+    for match in BRACE_RE.finditer(text, start):
+        token = match.group()
+        if token == "{":
+            depth += 1
+        elif token == "}":
+            depth -= 1
+            if depth == 0:
+                return match.end()
+    return -1
+
+
+def _action_input_complete(text: str) -> bool:
+    """True once the text holds an 'Action Input:' with a balanced JSON object."""
+    idx = text.find("Action Input:")
+    if idx == -1:
+        return False
+    start = text.find("{", idx)
+    return start != -1 and _balanced_end(text, start) != -1
+
+
+def _extract_json_object(text: str) -> str:
+    """Returns the first balanced {...} object in text (or text unchanged)."""
+    start = text.find("{")
+    if start == -1:
+        return text
+    end = _balanced_end(text, start)
+    return text[start:end] if end != -1 else text[start:]
+
+
+def _parse_action_args(raw_input: str) -> dict:
+    """Decodes an 'Action Input' into tool arguments.
+
+    Markdown code fences are stripped and the JSON object is cut out of any
+    surrounding text before decoding. Raises json.JSONDecodeError on failure.
+    """
+    text = _extract_json_object(FENCE_RE.sub("", raw_input).strip())
+    if MSGSPEC_AVAILABLE:
+        try:
+            return _ARGS_DECODER.decode(text)
+        except msgspec.DecodeError as e:
+            raise json.JSONDecodeError(str(e), text, 0) from e
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError
+    if ORJSON_AVAILABLE:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
 class CardiologyScenarioClient:
+    # Keep the model (and the KV cache of the static system prompt) resident
+    # between ReAct turns so Ollama only prefills the newly appended tokens.
+    KEEP_ALIVE = "30m"
+    NUM_CTX = 4096
+
     def __init__(self, model_name="amsaravi/medgemma-4b-it:q6"):
         self.model_name = model_name
         self.client = ollama.AsyncClient()
+        self.system_prompt = None
         
         self.system_prompt_template = """You are an autonomous Night Watch Medical AI specialized in cardiology.
 You have access to the following tools via an MCP Server:
@@ -42,19 +119,32 @@ Final Answer: your final triage assessment and actionable instructions for the n
 NEVER make up the Observation yourself. When you output 'Action Input:', STOP writing immediately.
 """
 
-    async def _query_llm(self, prompt: str, system_prompt: str) -> str:
-        response = await self.client.chat(
+    async def _query_llm(self, prompt: str) -> str:
+        """Streams the reply and returns as soon as the Action Input JSON is complete."""
+        stream = await self.client.chat(
             model=self.model_name,
             messages=[
-                {'role': 'system', 'content': system_prompt},
+                {'role': 'system', 'content': self.system_prompt},
                 {'role': 'user', 'content': prompt}
             ],
             options={
                 "temperature": 0.1, 
-                "stop": ["Observation:"]
-            } 
+                "stop": ["Observation:"],
+                "num_ctx": self.NUM_CTX
+            },
+            keep_alive=self.KEEP_ALIVE,
+            stream=True
         )
-        return response['message']['content']
+        output = ""
+        try:
+            async for chunk in stream:
+                output += chunk['message']['content']
+                # No need to wait for trailing tokens once the tool call is parseable
+                if _action_input_complete(output):
+                    break
+        finally:
+            await stream.aclose()
+        return output
 
     async def _generate_instructions(self, analysis: str) -> str:
         """Generate actionable instructions based on cardiology analysis"""
@@ -82,8 +172,10 @@ Be concise and clinical."""
             ],
             options={
                 "temperature": 0.1,
-                "stop": []
-            }
+                "stop": [],
+                "num_ctx": self.NUM_CTX
+            },
+            keep_alive=self.KEEP_ALIVE
         )
         return response['message']['content']
 
@@ -103,7 +195,7 @@ Be concise and clinical."""
                 available_tools = {t.name: t for t in tools_response.tools}
                 
                 tool_descriptions = "\n".join([f"- {t.name}: {t.description}" for t in available_tools.values()])
-                system_prompt = self.system_prompt_template.format(tool_descriptions=tool_descriptions)
+                self.system_prompt = self.system_prompt_template.format(tool_descriptions=tool_descriptions)
 
                 print(f"==============================================")
                 print(f"🫀 CARDIOLOGY NIGHT WATCH AGENT")
@@ -116,7 +208,7 @@ Be concise and clinical."""
                 
                 for i in range(max_iterations):
                     print(f"\n[Loop {i+1}] MedGemma is thinking...")
-                    llm_output = await self._query_llm(prompt_scratchpad, system_prompt)
+                    llm_output = await self._query_llm(prompt_scratchpad)
                     
                     print(llm_output.strip())
                     prompt_scratchpad += llm_output + "\n"
@@ -125,8 +217,8 @@ Be concise and clinical."""
                         print("\n✅ CARDIOLOGY ASSESSMENT COMPLETE.")
                         return
                     
-                    action_match = re.search(r"Action:\s*(.*?)\n", llm_output)
-                    input_match = re.search(r"Action Input:\s*(.+?)(?:\n\s*\n|\Z)", llm_output, re.DOTALL)
+                    action_match = ACTION_RE.search(llm_output)
+                    input_match = ACTION_INPUT_RE.search(llm_output)
 
                     if action_match and input_match:
                         action_name = action_match.group(1).strip()
@@ -135,17 +227,7 @@ Be concise and clinical."""
                         if action_name in available_tools:
                             print(f"  --> [MCP] Calling '{action_name}' (Please wait...)")
                             try:
-                                # Clean JSON: remove markdown code blocks
-                                raw_input = raw_input.replace('```json', '').replace('```', '').strip()
-                                
-                                # Extract JSON if it's wrapped in code blocks
-                                if raw_input.startswith('{'):
-                                    # Find the last closing brace
-                                    last_brace = raw_input.rfind('}')
-                                    if last_brace != -1:
-                                        raw_input = raw_input[:last_brace + 1]
-                                
-                                action_args = json.loads(raw_input)
+                                action_args = _parse_action_args(raw_input)
                                 
                                 tool_result = await session.call_tool(action_name, arguments=action_args)
                                 observation = tool_result.content[0].text if tool_result.content else "Success, but no output."
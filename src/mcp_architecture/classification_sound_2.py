@@ -11,6 +11,9 @@ import warnings
 import getpass
 import joblib
 import sys
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -22,10 +25,47 @@ os.environ['ABSL_LOG_LEVEL'] = '3'
 os.environ['HF_HUB_DISABLE_PROGRESS_BARS'] = '1'
 
 from huggingface_hub import from_pretrained_keras, login
+
+# Optional: oneDAL-accelerated RandomForest (must be patched before sklearn imports)
+try:
+    from sklearnex import patch_sklearn
+    patch_sklearn(["random_forest_classifier"], verbose=False)
+except ImportError:
+    pass
+
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, accuracy_score
 
+# Optional: compiled RF inference through ONNX Runtime
+try:
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+    SKL2ONNX_AVAILABLE = True
+except ImportError:
+    SKL2ONNX_AVAILABLE = False
+
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+# Optional: decode with libsndfile and resample with libsoxr directly
+try:
+    import soundfile as sf
+    import soxr
+    FAST_AUDIO_IO_AVAILABLE = True
+except ImportError:
+    FAST_AUDIO_IO_AVAILABLE = False
+
+# Optional: JIT-compiled silence screening
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 # Suppress librosa warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="soundfile")
 warnings.filterwarnings("ignore", module="librosa")
@@ -42,6 +82,18 @@ CLIP_OVERLAP_PERCENT = 10
 CLIP_IGNORE_SILENT_CLIPS = True
 SILENCE_RMS_THRESHOLD_DB = -50
 
+# Random Forest size: shallower, fewer trees keep predict() cache-friendly
+RF_N_ESTIMATORS = 64
+RF_MAX_DEPTH = 16
+RF_MIN_SAMPLES_LEAF = 2
+
+# Source frames decoded per read when streaming audio from disk
+STREAM_BLOCK_FRAMES = CLIP_LENGTH * 4
+# Number of clips sent to HeAR per call (clips from many files share a batch)
+HEAR_BATCH_SIZE = 128
+# Worker processes used to decode audio files in process_dataset
+DECODE_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
 # def authenticate_huggingface():
 #     token = os.environ.get("HF_TOKEN")
 #     if not token:
@@ -62,61 +114,276 @@ def load_hear_model():
         print("Failed to load model. Did you authenticate with Hugging Face?", file=sys.stderr)
         raise e
 
-def extract_embeddings_from_file(file_path, infer_fn):
+@functools.lru_cache(maxsize=1)
+def get_hear_model():
+    """Returns the HeAR serving function, loading it once per process."""
+    return load_hear_model()
+
+@functools.lru_cache(maxsize=4)
+def _load_rf_model(saved_model_path, mtime):
+    model = joblib.load(saved_model_path)
+    # Models saved before n_jobs was set still predict on every core
+    if hasattr(model, "n_jobs"):
+        model.n_jobs = -1
+    return model
+
+def get_rf_model(saved_model_path=MODEL_SAVE_PATH):
+    """Returns the trained classifier, reloading only when the file changes."""
+    return _load_rf_model(os.path.abspath(saved_model_path), os.path.getmtime(saved_model_path))
+
+def onnx_model_path(saved_model_path=MODEL_SAVE_PATH):
+    """Path of the ONNX export stored next to the joblib classifier."""
+    return os.path.splitext(saved_model_path)[0] + ".onnx"
+
+def export_onnx(model, n_features, saved_model_path=MODEL_SAVE_PATH):
+    """Exports the fitted classifier to ONNX; returns the path or None."""
+    if not SKL2ONNX_AVAILABLE:
+        return None
+    onnx_path = onnx_model_path(saved_model_path)
+    try:
+        onx = convert_sklearn(
+            model,
+            initial_types=[("x", FloatTensorType([None, n_features]))],
+            options={id(model): {"zipmap": False}}
+        )
+    except Exception as e:
+        # e.g. estimator types skl2onnx has no converter for
+        print(f"ONNX export skipped: {e}", file=sys.stderr)
+        return None
+    with open(onnx_path, "wb") as f:
+        f.write(onx.SerializeToString())
+    return onnx_path
+
+@functools.lru_cache(maxsize=4)
+def _load_onnx_session(onnx_path, mtime):
+    return ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+
+def get_onnx_session(saved_model_path=MODEL_SAVE_PATH):
+    """Returns an ONNX Runtime session for the classifier, or None to use sklearn.
+
+    The export is ignored when it is older than the joblib model (stale).
+    """
+    if not ONNXRUNTIME_AVAILABLE:
+        return None
+    onnx_path = onnx_model_path(saved_model_path)
+    if not os.path.exists(onnx_path):
+        return None
+    onnx_mtime = os.path.getmtime(onnx_path)
+    if os.path.exists(saved_model_path) and onnx_mtime < os.path.getmtime(saved_model_path):
+        return None
+    return _load_onnx_session(os.path.abspath(onnx_path), onnx_mtime)
+
+def warm_up(saved_model_path=MODEL_SAVE_PATH):
+    """Loads HeAR and the classifier ahead of the first inference() call."""
+    get_hear_model()
+    if os.path.exists(saved_model_path):
+        get_rf_model(saved_model_path)
+        get_onnx_session(saved_model_path)
+
+def extract_clips_from_file(file_path):
+    """Loads an audio file and returns its non-silent clips as a (N, CLIP_LENGTH) array."""
     try:
+        if FAST_AUDIO_IO_AVAILABLE:
+            return _stream_clips(file_path)
         audio, _ = librosa.load(file_path, sr=SAMPLE_RATE, mono=True)
     except Exception as e:
         print(f"Error loading {file_path}: {e}", file=sys.stderr)
         return None
 
-    clip_batch = []
+    return _slice_clips(np.asarray(audio, dtype=np.float32))
+
+def _stream_clips(file_path):
+    """Decodes the file block by block and slices clips as audio arrives.
+
+    Only the current block plus the tail of the previous window is held in
+    memory, so long recordings never materialize as one array. Clips are the
+    same windows _slice_clips would cut from the fully decoded signal.
+    """
     overlap_samples = int(CLIP_LENGTH * (CLIP_OVERLAP_PERCENT / 100))
     step_size = CLIP_LENGTH - overlap_samples
-    num_clips = max(1, (len(audio) - overlap_samples) // step_size)
 
-    for i in range(num_clips):
-        start_sample = i * step_size
-        end_sample = start_sample + CLIP_LENGTH
-        clip = audio[start_sample:end_sample]
-        
-        if end_sample > len(audio):
-            clip = np.pad(clip, (0, CLIP_LENGTH - len(clip)), 'constant')
-            
-        rms_loudness = round(20 * np.log10(np.sqrt(np.mean(clip**2) + 1e-10)))
-        if CLIP_IGNORE_SILENT_CLIPS and rms_loudness < SILENCE_RMS_THRESHOLD_DB:
-            continue
-            
-        clip_batch.append(clip)
-
-    if not clip_batch:
+    sr = sf.info(file_path).samplerate
+    # Same resampler librosa.load uses by default (soxr_hq), in streaming mode
+    resampler = soxr.ResampleStream(sr, SAMPLE_RATE, 1, dtype='float32', quality='HQ') if sr != SAMPLE_RATE else None
+
+    clips = _GrowableArray((CLIP_LENGTH,), np.float32)
+    pending = np.empty(0, dtype=np.float32)
+    emitted_window = False
+    blocks = sf.blocks(file_path, blocksize=STREAM_BLOCK_FRAMES, dtype='float32', always_2d=True)
+    for block, is_last in _with_last_flag(blocks):
+        block = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+        if resampler is not None:
+            block = resampler.resample_chunk(block, last=is_last)
+        pending = np.concatenate((pending, block))
+
+        n_windows = (len(pending) - CLIP_LENGTH) // step_size + 1 if len(pending) >= CLIP_LENGTH else 0
+        if n_windows > 0:
+            emitted_window = True
+            kept = _slice_clips(pending[:(n_windows - 1) * step_size + CLIP_LENGTH])
+            if kept is not None:
+                clips.extend(kept)
+            pending = pending[n_windows * step_size:]
+
+    # A recording shorter than one clip is padded into a single clip
+    if not emitted_window:
+        return _slice_clips(pending)
+    if len(clips) == 0:
         return None
+    return clips.finalize()
 
-    clip_batch = np.asarray(clip_batch)
-    embedding_batch = infer_fn(x=clip_batch)['output_0'].numpy()
-    return embedding_batch
+def _with_last_flag(iterable):
+    """Yields (item, is_last) pairs."""
+    iterator = iter(iterable)
+    try:
+        previous = next(iterator)
+    except StopIteration:
+        return
+    for item in iterator:
+        yield previous, False
+        previous = item
+    yield previous, True
 
-def process_dataset(data_dir, infer_fn):
-    all_embeddings = []
-    all_labels = []
-    
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _window_mean_power(audio, step, clip_len, n_windows):
+        """Mean power of each window in one pass, without temporaries."""
+        out = np.empty(n_windows)
+        for i in prange(n_windows):
+            start = i * step
+            acc = 0.0
+            for j in range(clip_len):
+                acc += audio[start + j] * audio[start + j]
+            out[i] = acc / clip_len
+        return out
+
+def _slice_clips(audio):
+    """Cuts audio into overlapping CLIP_LENGTH windows and drops silent ones."""
+    overlap_samples = int(CLIP_LENGTH * (CLIP_OVERLAP_PERCENT / 100))
+    step_size = CLIP_LENGTH - overlap_samples
+
+    # Only a recording shorter than one clip needs padding: every other window
+    # start (multiples of step_size) leaves room for a full clip.
+    if len(audio) < CLIP_LENGTH:
+        audio = np.pad(audio, (0, CLIP_LENGTH - len(audio)), 'constant')
+
+    # Strided view, no copy: row i is audio[i*step_size : i*step_size + CLIP_LENGTH]
+    windows = np.lib.stride_tricks.sliding_window_view(audio, CLIP_LENGTH)[::step_size]
+
+    if CLIP_IGNORE_SILENT_CLIPS:
+        if NUMBA_AVAILABLE:
+            mean_power = _window_mean_power(audio, step_size, CLIP_LENGTH, len(windows))
+        else:
+            mean_power = np.einsum('ij,ij->i', windows, windows, dtype=np.float64) / CLIP_LENGTH
+        rms_loudness = np.round(10 * np.log10(mean_power + 1e-10))
+        windows = windows[rms_loudness >= SILENCE_RMS_THRESHOLD_DB]
+
+    if len(windows) == 0:
+        return None
+
+    return np.ascontiguousarray(windows)
+
+class _GrowableArray:
+    """Append-only row buffer that doubles its capacity instead of copying per append."""
+
+    def __init__(self, row_shape, dtype, capacity=64):
+        self._data = np.empty((capacity, *row_shape), dtype=dtype)
+        self._size = 0
+
+    def extend(self, rows):
+        needed = self._size + len(rows)
+        if needed > len(self._data):
+            grown = np.empty((max(needed, 2 * len(self._data)), *self._data.shape[1:]), dtype=self._data.dtype)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+        self._data[self._size:needed] = rows
+        self._size = needed
+
+    def __len__(self):
+        return self._size
+
+    def finalize(self):
+        return self._data[:self._size]
+
+def embed_clips(clips, infer_fn, batch_size=HEAR_BATCH_SIZE):
+    """Runs HeAR over clips in fixed-size batches and returns the stacked embeddings."""
+    if len(clips) <= batch_size:
+        # Single batch (the inference case): hand back the tensor's host buffer
+        # as is; .numpy() on a CPU tensor shares memory, so nothing is copied
+        return infer_fn(x=clips)['output_0'].numpy()
+
+    embeddings = None
+    for start in range(0, len(clips), batch_size):
+        batch = clips[start:start + batch_size]
+        batch_embeddings = infer_fn(x=batch)['output_0'].numpy()
+        if embeddings is None:
+            embeddings = np.empty((len(clips), batch_embeddings.shape[1]), dtype=np.float32)
+        embeddings[start:start + len(batch_embeddings)] = batch_embeddings
+    return embeddings
+
+def extract_embeddings_from_file(file_path, infer_fn):
+    clips = extract_clips_from_file(file_path)
+    if clips is None:
+        return None
+    return embed_clips(clips, infer_fn)
+
+def _decode_file(task):
+    """Process-pool worker: decodes one (file_path, class_idx) task into clips."""
+    file_path, class_idx = task
+    return extract_clips_from_file(file_path), class_idx
+
+def process_dataset(data_dir, infer_fn, max_workers=DECODE_WORKERS):
     classes = [d for d in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, d))]
     print(f"Found classes: {classes}", file=sys.stderr)
     
     if not classes:
         raise ValueError(f"No subfolders found in {data_dir}.")
 
-    for class_label in classes:
+    tasks = []
+    for class_idx, class_label in enumerate(classes):
         class_dir = os.path.join(data_dir, class_label)
         audio_files = glob.glob(os.path.join(class_dir, "*.wav")) + glob.glob(os.path.join(class_dir, "*.ogg"))
-        
-        for file_path in audio_files:
-            embeddings = extract_embeddings_from_file(file_path, infer_fn)
-            if embeddings is not None:
-                for emb in embeddings:
-                    all_embeddings.append(emb)
-                    all_labels.append(class_label)
-                    
-    return np.array(all_embeddings), np.array(all_labels)
+        tasks.extend((file_path, class_idx) for file_path in audio_files)
+
+    # Decode (and drop silent clips) in worker processes. The main process
+    # embeds clips as soon as a full HeAR batch is pending, so only one batch
+    # of raw clips is held at a time alongside the embeddings and label indices.
+    pending = np.empty((HEAR_BATCH_SIZE, CLIP_LENGTH), dtype=np.float32)
+    n_pending = 0
+    embeddings = None
+    all_label_idx = _GrowableArray((), np.int32, capacity=1024)
+
+    def flush_pending():
+        nonlocal embeddings, n_pending
+        batch_embeddings = embed_clips(pending[:n_pending], infer_fn)
+        if embeddings is None:
+            embeddings = _GrowableArray(batch_embeddings.shape[1:], np.float32, capacity=1024)
+        embeddings.extend(batch_embeddings)
+        n_pending = 0
+
+    # Spawn the workers: train() has already loaded TensorFlow, and forking a
+    # process whose TF/BLAS thread pools are running can deadlock the children.
+    spawn_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=spawn_context) as executor:
+        for clips, class_idx in executor.map(_decode_file, tasks, chunksize=8):
+            if clips is None:
+                continue
+            all_label_idx.extend(np.full(len(clips), class_idx, dtype=np.int32))
+            start = 0
+            while start < len(clips):
+                take = min(HEAR_BATCH_SIZE - n_pending, len(clips) - start)
+                pending[n_pending:n_pending + take] = clips[start:start + take]
+                n_pending += take
+                start += take
+                if n_pending == HEAR_BATCH_SIZE:
+                    flush_pending()
+
+    if n_pending:
+        flush_pending()
+    if embeddings is None:
+        return np.empty((0,)), np.empty((0,))
+
+    labels = np.asarray(classes)[all_label_idx.finalize()]
+    return embeddings.finalize(), labels
 
 def train(save_path=MODEL_SAVE_PATH):
     # authenticate_huggingface()
@@ -137,7 +404,13 @@ def train(save_path=MODEL_SAVE_PATH):
 
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=stratify_param)
     print("\n--- Training Random Forest Classifier ---", file=sys.stderr)
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
+    model = RandomForestClassifier(
+        n_estimators=RF_N_ESTIMATORS,
+        max_depth=RF_MAX_DEPTH,
+        min_samples_leaf=RF_MIN_SAMPLES_LEAF,
+        n_jobs=-1,
+        random_state=42
+    )
     model.fit(X_train, y_train)
     
     predictions = model.predict(X_test)
@@ -146,9 +419,12 @@ def train(save_path=MODEL_SAVE_PATH):
 
     joblib.dump(model, save_path)
     print(f"\nModel successfully saved to: {save_path}", file=sys.stderr)
+    onnx_path = export_onnx(model, X.shape[1], save_path)
+    if onnx_path:
+        print(f"ONNX export saved to: {onnx_path}", file=sys.stderr)
     return save_path
 
-def classify_new_audio(file_path, model, infer_fn):
+def classify_new_audio(file_path, model, infer_fn, onnx_session=None):
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Audio file not found: {file_path}")
 
@@ -156,10 +432,19 @@ def classify_new_audio(file_path, model, infer_fn):
     if embeddings is None or len(embeddings) == 0:
         raise ValueError("Could not extract embeddings. The file might be invalid or pure silence.")
         
-    predictions = model.predict(embeddings)
-    unique_classes, counts = np.unique(predictions, return_counts=True)
-    final_prediction = unique_classes[np.argmax(counts)]
-    return str(final_prediction)
+    # HeAR emits float32; keep it (contiguous) so neither backend upcasts or copies
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    # Per-clip class indices into model.classes_ (ONNX probabilities share that order)
+    if onnx_session is not None:
+        probabilities = onnx_session.run(["probabilities"], {"x": embeddings})[0]
+    else:
+        probabilities = model.predict_proba(embeddings)
+    clip_votes = probabilities.argmax(axis=1)
+
+    # Majority vote in O(N); ties go to the first class, as with np.unique
+    final_idx = np.bincount(clip_votes, minlength=len(model.classes_)).argmax()
+    return str(model.classes_[final_idx])
 
 def inference(file_path, saved_model_path=MODEL_SAVE_PATH):
     print(f"\n--- Running Agent Inference on: {file_path} ---", file=sys.stderr)
@@ -167,9 +452,9 @@ def inference(file_path, saved_model_path=MODEL_SAVE_PATH):
         raise FileNotFoundError(f"Trained model not found at {saved_model_path}. Please run train() first.")
         
     #authenticate_huggingface()
-    model = joblib.load(saved_model_path)
-    infer_fn = load_hear_model()
-    diagnosis = classify_new_audio(file_path, model, infer_fn)
+    model = get_rf_model(saved_model_path)
+    infer_fn = get_hear_model()
+    diagnosis = classify_new_audio(file_path, model, infer_fn, get_onnx_session(saved_model_path))
     
     print(f">> PATIENT DIAGNOSIS: {diagnosis.upper()} <<", file=sys.stderr)
     return diagnosis
@@ -4,13 +4,16 @@ This exposes our audio classifier and database access to ANY MCP-compatible clie
 """
 
 import json
+import os
+import sys
+import threading
 from pathlib import Path
 from mcp.server.fastmcp import FastMCP
 from datetime import datetime
 
 # Import your audio inference tool
 try:
-    from classification_sound_2 import inference
+    from classification_sound_2 import inference, warm_up as warm_up_audio
 except ImportError:
     print("Warning: 'classification_sound.py' not found. Audio tool will fail.")
 
@@ -28,6 +31,66 @@ except ImportError as e:
     print(f"Warning: 'cardiology_sentinel' module not found. Error: {e}")
     SENTINEL_AVAILABLE = False
 
+# Optional: short-lived memo of tool results (agents often repeat identical calls)
+try:
+    from cachetools import TTLCache
+    CACHETOOLS_AVAILABLE = True
+except ImportError:
+    CACHETOOLS_AVAILABLE = False
+
+AUDIO_MODEL_FILE = "medical_sound_rf_model.joblib"
+SENTINEL_MODEL_FILE = Path(__file__).parent.parent.parent / "models" / "medgemma-night-sentinel-Q4_K_M.gguf"
+SENTINEL_N_CTX = 2048
+# Saved prompt states let calls alternating between patients reuse their prefix.
+# Off by default: with a cache set, llama.cpp copies the full KV state after
+# every completion, which single-patient sessions pay for without benefit.
+SENTINEL_PROMPT_CACHE_BYTES = int(os.environ.get("SENTINEL_PROMPT_CACHE_BYTES", "0"))
+TOOL_CACHE_TTL_SECONDS = 5
+TOOL_CACHE_SIZE = 128
+
+if CACHETOOLS_AVAILABLE:
+    _room_audio_cache = TTLCache(maxsize=TOOL_CACHE_SIZE, ttl=TOOL_CACHE_TTL_SECONDS)
+    _vitals_cache = TTLCache(maxsize=TOOL_CACHE_SIZE, ttl=TOOL_CACHE_TTL_SECONDS)
+    _cardiology_cache = TTLCache(maxsize=TOOL_CACHE_SIZE, ttl=TOOL_CACHE_TTL_SECONDS)
+else:
+    _room_audio_cache = _vitals_cache = _cardiology_cache = None
+_tool_cache_lock = threading.Lock()
+
+
+# The GGUF model is loaded once and reused by every cardiology call
+_sentinel = None
+_sentinel_lock = threading.Lock()
+# One llama.cpp context cannot serve two generations at once
+_sentinel_predict_lock = threading.Lock()
+
+
+def _get_sentinel():
+    """Returns the shared SentinelInference, loading the model on first use."""
+    global _sentinel
+    if _sentinel is None:
+        with _sentinel_lock:
+            if _sentinel is None:
+                _sentinel = SentinelInference(
+                    model_path=str(SENTINEL_MODEL_FILE),
+                    n_ctx=SENTINEL_N_CTX,
+                    prompt_cache_bytes=SENTINEL_PROMPT_CACHE_BYTES,
+                )
+    return _sentinel
+
+
+def _cached_result(cache, key, compute):
+    """Returns compute() through a TTL cache; exceptions are never cached."""
+    if cache is None:
+        return compute()
+    with _tool_cache_lock:
+        if key in cache:
+            return cache[key]
+    result = compute()
+    with _tool_cache_lock:
+        cache[key] = result
+    return result
+
+
 # Initialize the FastMCP Server
 mcp = FastMCP("NightWatchServer")
 
@@ -40,9 +103,15 @@ def analyze_room_audio(room_number: str) -> str:
     """
     # In a real app, you'd fetch the live stream for the specific room_number
     audio_file = "./Testing_data/Coughing_actresses_153.wav" 
-    model_file = "medical_sound_rf_model.joblib"
     try:
-        diagnosis = inference(audio_file, saved_model_path=model_file)
+        if room_number == "live":
+            # A live stream must always be re-analyzed
+            diagnosis = inference(audio_file, saved_model_path=AUDIO_MODEL_FILE)
+        else:
+            diagnosis = _cached_result(
+                _room_audio_cache, room_number,
+                lambda: inference(audio_file, saved_model_path=AUDIO_MODEL_FILE)
+            )
         return f"Acoustic AI detected: {diagnosis.upper()} in Room {room_number}"
     except Exception as e:
         return f"Audio analysis failed. Error: {e}"
@@ -56,8 +125,10 @@ def get_patient_vitals(patient_id: str) -> str:
         "101": {"HR": 72, "SpO2": 98, "BP": "120/80", "Temp": 36.8, "ECG": "Normal Sinus"},
         "402": {"HR": 115, "SpO2": 88, "BP": "145/95", "Temp": 37.9, "ECG": "Tachycardia"}
     }
-    vitals = db.get(patient_id, "Patient ID not found in Vitals Database.")
-    return json.dumps(vitals)
+    return _cached_result(
+        _vitals_cache, patient_id,
+        lambda: json.dumps(db.get(patient_id, "Patient ID not found in Vitals Database."))
+    )
 
 @mcp.tool()
 def get_patient_history(patient_id: str) -> str:
@@ -132,11 +203,13 @@ def analyze_cardiology_sentinel(patient_id: str, vitals_text: str) -> str:
         # Build prompt for the sentinel model
         prompt = build_prompt(subject, window_summary)
         
-        # Load model and run inference
-        model_path = str(Path(__file__).parent.parent.parent / "models" / "medgemma-night-sentinel-Q4_K_M.gguf")
+        # Run inference on the shared model
+        def run_sentinel():
+            sentinel = _get_sentinel()
+            with _sentinel_predict_lock:
+                return sentinel.predict(prompt, max_tokens=256)
         
-        sentinel = SentinelInference(model_path=model_path, n_ctx=2048)
-        result = sentinel.predict(prompt, max_tokens=256)
+        result = _cached_result(_cardiology_cache, (patient_id, vitals_text), run_sentinel)
         
         return f"CARDIOLOGY SENTINEL ANALYSIS for Patient {patient_id}:\n\n{result}"
         
@@ -145,5 +218,11 @@ def analyze_cardiology_sentinel(patient_id: str, vitals_text: str) -> str:
 
 
 if __name__ == "__main__":
+    # Load HeAR + the sound classifier once so the first tool call isn't cold
+    try:
+        warm_up_audio(AUDIO_MODEL_FILE)
+    except Exception as e:
+        print(f"Warning: audio model warm-up failed. Error: {e}", file=sys.stderr)
+
     # Run the FastMCP server on stdio
     mcp.run()
\ No newline at end of file
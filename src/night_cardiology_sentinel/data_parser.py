@@ -4,15 +4,35 @@ import re
 from dataclasses import dataclass
 from typing import Dict, Iterable, List, Optional
 
-
-TIME_HR_LINE = re.compile(
-    r"Time:\s*(?P<time>[^-]+?)\s*-\s*heart rate\s*\[#/min\]\s*:\s*(?P<hr>[\d.]+)",
-    re.IGNORECASE,
+import numpy as np
+
+
+# Above this many timed rows, 15-minute windows are bucketed with numpy
+CHUNK_NUMPY_MIN_ROWS = 1000
+
+# Vital sign key, upper-cased without spaces or %, -> canonical name
+KEY_ALIASES = {
+    "HEARTRATE": "HR",
+    "HR": "HR",
+    "SPO2": "SPO2",
+    "SP02": "SPO2",
+    "O2SAT": "SPO2",
+    "SPO2PERCENT": "SPO2",
+    "RESP": "RESP",
+    "RR": "RESP",
+    "PULSE": "PULSE",
+}
+_KEY_DROP_CHARS = str.maketrans("", "", "% ")
+
+# "Time: <t> - heart rate [#/min]: <v>" fills hr, "Time: <t> - key: val, ..." fills kv
+# (the heart-rate form is case-insensitive, the key/value form is not)
+TIME_LINE = re.compile(
+    r"(?i:Time:\s*(?P<time>[^-]+?)\s*-\s*heart rate\s*\[#/min\]\s*:\s*(?P<hr>[\d.]+))"
+    r"|Time:\s*(?P<kv_time>[^-]+?)\s*-\s*(?P<kv>.+)"
 )
-TIME_KV_LINE = re.compile(r"Time:\s*(?P<time>[^-]+?)\s*-\s*(?P<kv>.+)")
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SubjectInfo:
     """Patient subject information."""
 
@@ -38,7 +58,7 @@ class SubjectInfo:
         return "\n".join(parts) if parts else "Unknown subject"
 
 
-@dataclass
+@dataclass(slots=True)
 class VitalsRow:
     """A single parsed row of vitals data."""
 
@@ -75,66 +95,64 @@ def parse_time_to_seconds(raw: str) -> Optional[float]:
 
 def normalize_key(key: str) -> str:
     """Normalize vital sign keys."""
-    key = key.strip()
-    key = key.replace("%", "").replace(" ", "")
-    key = key.upper()
-    if key in {"HEARTRATE", "HR"}:
-        return "HR"
-    if key in {"SPO2", "SP02", "O2SAT", "SPO2PERCENT"}:
-        return "SPO2"
-    if key in {"RESP", "RR"}:
-        return "RESP"
-    if key in {"PULSE"}:
-        return "PULSE"
-    return key
+    key = key.strip().translate(_KEY_DROP_CHARS).upper()
+    return KEY_ALIASES.get(key, key)
 
 
 def parse_vitals_lines(lines: Iterable[str]) -> List[VitalsRow]:
     """Parse vitals from text lines with two supported formats."""
     rows: List[VitalsRow] = []
+    match_line = TIME_LINE.match
+    to_float = float
+    normalize = normalize_key
     for raw_line in lines:
         line = raw_line.strip()
         if not line:
             continue
-        match_hr = TIME_HR_LINE.match(line)
-        if match_hr:
-            time_raw = match_hr.group("time").strip()
-            hr_val = float(match_hr.group("hr"))
-            rows.append(
-                VitalsRow(
-                    time_raw=time_raw,
-                    time_seconds=parse_time_to_seconds(time_raw),
-                    values={"HR": hr_val},
-                    raw_line=line,
-                )
-            )
+        match = match_line(line)
+        if match is None:
             continue
-        match_kv = TIME_KV_LINE.match(line)
-        if match_kv:
-            time_raw = match_kv.group("time").strip()
-            kv_blob = match_kv.group("kv")
-            values: Dict[str, float] = {}
-            for part in kv_blob.split(","):
-                if ":" not in part:
+        hr = match.group("hr")
+        time_raw = match.group("kv_time" if hr is None else "time").strip()
+        values: Dict[str, float]
+        if hr is not None:
+            values = {"HR": to_float(hr)}
+        else:
+            values = {}
+            for part in match.group("kv").split(","):
+                key, sep, value = part.partition(":")
+                if not sep:
                     continue
-                key, value = part.split(":", 1)
-                key = normalize_key(key)
                 try:
-                    values[key] = float(value.strip())
+                    values[normalize(key)] = to_float(value)
                 except ValueError:
                     continue
-            if values:
-                rows.append(
-                    VitalsRow(
-                        time_raw=time_raw,
-                        time_seconds=parse_time_to_seconds(time_raw),
-                        values=values,
-                        raw_line=line,
-                    )
-                )
+            if not values:
+                continue
+        rows.append(
+            VitalsRow(
+                time_raw=time_raw,
+                time_seconds=parse_time_to_seconds(time_raw),
+                values=values,
+                raw_line=line,
+            )
+        )
     return rows
 
 
+def _chunk_by_time_numpy(rows: List[VitalsRow], window_seconds: int) -> List[List[VitalsRow]]:
+    """Stable-sort timed rows and split them where the window bucket changes."""
+    times = np.fromiter((row.time_seconds for row in rows), dtype=np.float64, count=len(rows))
+    order = np.argsort(times, kind="stable")
+    buckets = (times[order] // window_seconds).astype(np.int64)
+    cuts = (np.flatnonzero(np.diff(buckets)) + 1).tolist()
+    order = order.tolist()
+    return [
+        [rows[i] for i in order[start:end]]
+        for start, end in zip([0] + cuts, cuts + [len(order)])
+    ]
+
+
 def chunk_rows(
     rows: List[VitalsRow],
     window_mode: str,
@@ -148,9 +166,11 @@ def chunk_rows(
         with_time = [row for row in rows if row.time_seconds is not None]
         if not with_time:
             return chunk_rows(rows, "10-row windows", window_rows=window_rows)
+        window_seconds = window_minutes * 60
+        if len(with_time) > CHUNK_NUMPY_MIN_ROWS:
+            return _chunk_by_time_numpy(with_time, window_seconds)
         with_time.sort(key=lambda r: r.time_seconds or 0)
         windows: Dict[int, List[VitalsRow]] = {}
-        window_seconds = window_minutes * 60
         for row in with_time:
             bucket = int((row.time_seconds or 0) // window_seconds)
             windows.setdefault(bucket, []).append(row)
@@ -164,19 +184,26 @@ def summarize_window(rows: List[VitalsRow]) -> str:
     """Generate summary statistics for a window of vitals."""
     if not rows:
         return "No vitals"
+    # Per metric: [count, sum, min, max], updated in one pass over the rows
     metrics: Dict[str, List[float]] = {}
     for row in rows:
         for key, value in row.values.items():
-            metrics.setdefault(key, []).append(value)
+            acc = metrics.get(key)
+            if acc is None:
+                metrics[key] = [1, value, value, value]
+                continue
+            acc[0] += 1
+            acc[1] += value
+            if value < acc[2]:
+                acc[2] = value
+            if value > acc[3]:
+                acc[3] = value
     summary_lines = [f"Window rows: {len(rows)}"]
     times = [r.time_raw for r in rows if r.time_raw]
     if times:
         summary_lines.append(f"Time range: {times[0]} -> {times[-1]}")
-    for key, values in metrics.items():
-        if not values:
-            continue
-        avg = sum(values) / len(values)
+    for key, (count, total, low, high) in metrics.items():
         summary_lines.append(
-            f"{key}: avg {avg:.2f}, min {min(values):.2f}, max {max(values):.2f}"
+            f"{key}: avg {total / count:.2f}, min {low:.2f}, max {high:.2f}"
         )
     return "\n".join(summary_lines)
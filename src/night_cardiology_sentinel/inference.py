@@ -9,19 +9,26 @@ except Exception:
     hf_hub_download = None
 
 try:
-    from llama_cpp import Llama
+    from llama_cpp import Llama, LlamaRAMCache
 except Exception:
     Llama = None
+    LlamaRAMCache = None
 
 from .data_parser import SubjectInfo
 
 
-def build_prompt(subject: SubjectInfo, window_summary: str) -> str:
-    """Build a structured prompt for the Night Sentinel model."""
+def build_prompt(subject: SubjectInfo, window_summary: str, subject_block: Optional[str] = None) -> str:
+    """Build a structured prompt for the Night Sentinel model.
+
+    Callers prompting many windows of one subject can pass subject_block
+    (subject.as_prompt_block(), formatted once) instead of re-formatting it.
+    """
+    if subject_block is None:
+        subject_block = subject.as_prompt_block()
     return (
         "<start_of_turn>user\n"
         "[NIGHT SENTINEL SYSTEM]\n"
-        f"Patient Profile:\n{subject.as_prompt_block()}\n"
+        f"Patient Profile:\n{subject_block}\n"
         "Event/Anomaly (window summary):\n"
         f"{window_summary}\n"
         "    TASK:\n"
@@ -36,11 +43,19 @@ def build_prompt(subject: SubjectInfo, window_summary: str) -> str:
 class SentinelInference:
     """Wrapper for loading and running inference with the Night Sentinel model."""
 
-    def __init__(self, model_path: str, n_ctx: int = 2048):
-        """Initialize the inference engine with a GGUF model."""
+    def __init__(self, model_path: str, n_ctx: int = 2048, prompt_cache_bytes: int = 0):
+        """Initialize the inference engine with a GGUF model.
+
+        llama.cpp skips re-evaluating the prompt prefix shared with the previous
+        call, so consecutive windows of one subject only pay for their summary.
+        A non-zero prompt_cache_bytes also keeps evaluated prompt states in RAM,
+        so calls alternating between subjects resume from their own prefix.
+        """
         if Llama is None:
             raise RuntimeError("llama_cpp is not installed in this environment.")
         self.llm = Llama(model_path=model_path, n_ctx=n_ctx, verbose=False)
+        if prompt_cache_bytes:
+            self.llm.set_cache(LlamaRAMCache(capacity_bytes=prompt_cache_bytes))
 
     def predict(
         self,
@@ -5,10 +5,115 @@ Handles offline storage of the GraphRAG data
 
 import json
 import os
+import shutil
+import sqlite3
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple, Iterator
 from pathlib import Path
-import pickle
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+
+def _dumps(obj: Any, pretty: bool = False) -> bytes:
+    """Serialize to JSON bytes (orjson when available, stdlib json otherwise)"""
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=str, option=option)
+    return json.dumps(obj, default=str, indent=2 if pretty else None).encode("utf-8")
+
+
+def _msgpack_default(obj: Any) -> Any:
+    """Fallback for types msgpack cannot encode (mirrors the JSON encoder)"""
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    return str(obj)
+
+
+def _encode_node(node_data: Dict[str, Any]) -> bytes:
+    """Encode a node payload for the node database (msgpack when available)"""
+    if MSGPACK_AVAILABLE:
+        return msgpack.packb(node_data, use_bin_type=True, default=_msgpack_default)
+    return _dumps(node_data)
+
+
+def _decode_node(blob: bytes, node_id: str = "") -> Dict[str, Any]:
+    """Decode a node payload; JSON blobs (legacy or no msgpack) start with '{'"""
+    if bytes(blob[:1]) == b"{":
+        return _loads(blob)
+    if not MSGPACK_AVAILABLE:
+        raise RuntimeError(f"Node {node_id} is msgpack-encoded; install msgpack to read this store.")
+    return msgpack.unpackb(blob, raw=False)
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    """Write to a temporary file then rename it over path (no partial files)"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _link_or_copy(src: Path, dst: Path) -> None:
+    """
+    Hard-link src to dst (shared inode, no data copied), copying when linking
+    is not possible (e.g. across devices). Only used for files that are never
+    modified in place: index/edges are always replaced via _atomic_write.
+    """
+    tmp_path = dst.with_name(dst.name + ".tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        shutil.copy2(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+
+def _loads(data: bytes) -> Any:
+    """Deserialize JSON bytes or str"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class _LRUCache(OrderedDict):
+    """Size-bounded mapping that evicts the least recently used entry"""
+    
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+    
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+    
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+    
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
 
 
 class LocalGraphStore:
@@ -16,86 +121,242 @@ class LocalGraphStore:
     Local storage backend for the patient knowledge graph.
     
     Features:
-    - JSON-based persistence for portability
+    - Nodes in a single embedded SQLite table (JSON payloads)
+    - JSON-based edges/index for portability
     - Incremental updates
     - Backup and recovery
     - 100% offline operation
     """
     
-    def __init__(self, base_dir: str = "./data/graph_store"):
+    def __init__(
+        self,
+        base_dir: str = "./data/graph_store",
+        pretty_json: bool = False,
+        node_cache_size: int = 10_000
+    ):
         """
         Initialize the local graph store.
         
         Args:
             base_dir: Base directory for storing graph data
+            pretty_json: Indent the index/edge JSON files (for debugging; larger and slower)
+            node_cache_size: Maximum number of nodes kept in the in-memory LRU cache
         """
         self.base_dir = Path(base_dir)
+        self.pretty_json = pretty_json
         self.base_dir.mkdir(parents=True, exist_ok=True)
         
         # Storage paths
-        self.nodes_dir = self.base_dir / "nodes"
+        self.nodes_db = self.base_dir / "nodes.db"
+        self.nodes_dir = self.base_dir / "nodes"  # legacy one-file-per-node layout
         self.edges_file = self.base_dir / "edges.json"
         self.index_file = self.base_dir / "index.json"
         self.metadata_file = self.base_dir / "metadata.json"
         
-        # Create directories
-        self.nodes_dir.mkdir(exist_ok=True)
+        # Node store: one SQLite table instead of one JSON file per node
+        self._conn = sqlite3.connect(str(self.nodes_db), isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS nodes (id TEXT PRIMARY KEY, data BLOB NOT NULL)")
         
         # In-memory cache
-        self._node_cache: Dict[str, Dict[str, Any]] = {}
-        self._edge_cache: List[Dict[str, Any]] = []
+        self._node_cache: Dict[str, Dict[str, Any]] = _LRUCache(node_cache_size)
+        # Edges keyed by (source, target, relation), in insertion order, with
+        # secondary indices (key -> None dicts keep insertion order too)
+        self._edges: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self._by_source: Dict[str, Dict[Tuple[str, str, str], None]] = defaultdict(dict)
+        self._by_target: Dict[str, Dict[Tuple[str, str, str], None]] = defaultdict(dict)
+        self._by_relation: Dict[str, Dict[Tuple[str, str, str], None]] = defaultdict(dict)
         self._index: Dict[str, Any] = {}
+        # Sizes of the last edges/index payloads read or written (for statistics)
+        self._edges_bytes = 0
+        self._index_bytes = 0
+        
+        # Deferred writes inside `with store.batch():`
+        self._batch_depth = 0
+        self._index_dirty = False
+        self._edges_dirty = False
         
         # Load existing data
         self._load_index()
         self._load_edges()
+        self.migrate_json_nodes()
+    
+    def close(self) -> None:
+        """Close the node database connection"""
+        self._conn.close()
+    
+    def migrate_json_nodes(self, nodes_dir: Optional[Path] = None) -> int:
+        """
+        One-shot import of nodes stored in the legacy one-JSON-file-per-node layout.
+        
+        Imported files are removed. Returns the number of nodes migrated.
+        """
+        nodes_dir = Path(nodes_dir) if nodes_dir else self.nodes_dir
+        if not nodes_dir.is_dir():
+            return 0
+        
+        node_files = list(nodes_dir.glob("*.json"))
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO nodes (id, data) VALUES (?, ?)",
+                ((f.stem, f.read_bytes()) for f in node_files)
+            )
+        for f in node_files:
+            f.unlink()
+        if nodes_dir == self.nodes_dir and not any(nodes_dir.iterdir()):
+            nodes_dir.rmdir()
+        
+        if node_files:
+            self._index["node_count"] = self._count_nodes()
+            self._index["node_bytes"] = self._sum_node_bytes()
+            self._save_index()
+        return len(node_files)
+    
+    @contextmanager
+    def batch(self):
+        """
+        Group many writes: node inserts share one SQLite transaction and
+        index.json / edges.json are written once when the block exits.
+        
+        Use it for bulk ingestion:
+            with store.batch():
+                for node_id, data in nodes.items():
+                    store.save_node(node_id, data)
+        
+        Batches can be nested; only the outermost one commits and flushes.
+        If the outermost block raises, node writes are rolled back and the
+        index/edges are reloaded from disk instead.
+        """
+        if self._batch_depth == 0:
+            self._conn.execute("BEGIN")
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._rollback()
+            raise
+        self._batch_depth -= 1
+        if self._batch_depth == 0:
+            self._conn.execute("COMMIT")
+            self._flush()
+    
+    def _rollback(self) -> None:
+        """Discard a failed batch: node writes and deferred index/edge changes"""
+        self._conn.execute("ROLLBACK")
+        self._index_dirty = False
+        self._edges_dirty = False
+        self._node_cache.clear()
+        self._load_index()
+        self._load_edges()
+    
+    def _flush(self) -> None:
+        """Write deferred index/edge changes to disk"""
+        if self._edges_dirty:
+            self._edges_dirty = False
+            self._save_edges()
+        if self._index_dirty:
+            self._index_dirty = False
+            self._save_index()
+    
+    def _count_nodes(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+    
+    def _sum_node_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM nodes").fetchone()[0]
     
     def _load_index(self) -> None:
         """Load the node index from disk"""
         if self.index_file.exists():
-            with open(self.index_file, 'r', encoding='utf-8') as f:
-                self._index = json.load(f)
+            with open(self.index_file, 'rb') as f:
+                raw = f.read()
+            self._index = _loads(raw)
+            self._index_bytes = len(raw)
         else:
             self._index = {
                 "patients": {},
                 "node_count": 0,
                 "edge_count": 0,
+                "node_bytes": 0,
                 "last_updated": None
             }
+            self._index_bytes = 0
+        
+        # Indexes written before node sizes were tracked: reconcile once
+        if "node_bytes" not in self._index:
+            self._index["node_bytes"] = self._sum_node_bytes()
     
     def _save_index(self) -> None:
-        """Save the node index to disk"""
+        """Save the node index to disk (deferred while batching)"""
+        if self._batch_depth:
+            self._index_dirty = True
+            return
         self._index["last_updated"] = datetime.now().isoformat()
-        with open(self.index_file, 'w', encoding='utf-8') as f:
-            json.dump(self._index, f, indent=2)
+        data = _dumps(self._index, self.pretty_json)
+        _atomic_write(self.index_file, data)
+        self._index_bytes = len(data)
     
     def _load_edges(self) -> None:
         """Load edges from disk"""
+        self._edges.clear()
+        self._by_source.clear()
+        self._by_target.clear()
+        self._by_relation.clear()
+        self._edges_bytes = 0
         if self.edges_file.exists():
-            with open(self.edges_file, 'r', encoding='utf-8') as f:
-                self._edge_cache = json.load(f)
-        else:
-            self._edge_cache = []
+            with open(self.edges_file, 'rb') as f:
+                raw = f.read()
+            self._edges_bytes = len(raw)
+            for edge in _loads(raw):
+                self._add_edge_entry(edge)
     
     def _save_edges(self) -> None:
-        """Save edges to disk"""
-        with open(self.edges_file, 'w', encoding='utf-8') as f:
-            json.dump(self._edge_cache, f, indent=2)
+        """Save edges to disk (deferred while batching)"""
+        if self._batch_depth:
+            self._edges_dirty = True
+            return
+        data = _dumps(list(self._edges.values()), self.pretty_json)
+        _atomic_write(self.edges_file, data)
+        self._edges_bytes = len(data)
+    
+    def _add_edge_entry(self, edge: Dict[str, Any]) -> None:
+        """Register an edge in the edge map and its indices"""
+        key = (edge["source"], edge["target"], edge["relation"])
+        self._edges[key] = edge
+        self._by_source[key[0]][key] = None
+        self._by_target[key[1]][key] = None
+        self._by_relation[key[2]][key] = None
+    
+    def _remove_edge_entry(self, key: Tuple[str, str, str]) -> None:
+        """Remove an edge from the edge map and its indices"""
+        del self._edges[key]
+        for index, value in ((self._by_source, key[0]), (self._by_target, key[1]), (self._by_relation, key[2])):
+            bucket = index[value]
+            del bucket[key]
+            if not bucket:
+                del index[value]
     
     # ==================== Node Operations ====================
     
     def save_node(self, node_id: str, node_data: Dict[str, Any]) -> None:
-        """Save a single node to disk"""
+        """Save a single node to the node database"""
         # Update cache
         self._node_cache[node_id] = node_data
         
-        # Save to file
-        node_file = self.nodes_dir / f"{node_id}.json"
-        with open(node_file, 'w', encoding='utf-8') as f:
-            json.dump(node_data, f, indent=2, default=str)
+        previous = self._conn.execute("SELECT LENGTH(data) FROM nodes WHERE id = ?", (node_id,)).fetchone()
+        blob = _encode_node(node_data)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO nodes (id, data) VALUES (?, ?)",
+            (node_id, blob)
+        )
         
         # Update index
-        self._index["node_count"] = len(list(self.nodes_dir.glob("*.json")))
+        if previous is None:
+            self._index["node_count"] = self._index.get("node_count", 0) + 1
+        self._index["node_bytes"] = self._index.get("node_bytes", 0) + len(blob) - (previous[0] if previous else 0)
         
         # Track patient nodes
         if node_data.get("node_type") == "patient":
@@ -105,18 +366,17 @@ class LocalGraphStore:
         self._save_index()
     
     def load_node(self, node_id: str) -> Optional[Dict[str, Any]]:
-        """Load a single node from disk"""
+        """Load a single node from the node database"""
         # Check cache first
-        if node_id in self._node_cache:
-            return self._node_cache[node_id]
+        cached = self._node_cache.get(node_id)
+        if cached is not None:
+            return cached
         
-        # Load from file
-        node_file = self.nodes_dir / f"{node_id}.json"
-        if node_file.exists():
-            with open(node_file, 'r', encoding='utf-8') as f:
-                node_data = json.load(f)
-                self._node_cache[node_id] = node_data
-                return node_data
+        row = self._conn.execute("SELECT data FROM nodes WHERE id = ?", (node_id,)).fetchone()
+        if row is not None:
+            node_data = _decode_node(row[0], node_id)
+            self._node_cache[node_id] = node_data
+            return node_data
         
         return None
     
@@ -126,29 +386,27 @@ class LocalGraphStore:
         if node_id in self._node_cache:
             del self._node_cache[node_id]
         
-        # Remove file
-        node_file = self.nodes_dir / f"{node_id}.json"
-        if node_file.exists():
-            node_file.unlink()
+        row = self._conn.execute("SELECT LENGTH(data) FROM nodes WHERE id = ?", (node_id,)).fetchone()
+        if row is not None:
+            self._conn.execute("DELETE FROM nodes WHERE id = ?", (node_id,))
             
             # Update index
-            self._index["node_count"] = len(list(self.nodes_dir.glob("*.json")))
+            self._index["node_count"] = max(0, self._index.get("node_count", 0) - 1)
+            self._index["node_bytes"] = max(0, self._index.get("node_bytes", 0) - row[0])
             self._save_index()
             
             return True
         
         return False
     
+    def iter_nodes(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield (node_id, node_data) pairs one at a time without filling the cache"""
+        for node_id, data in self._conn.execute("SELECT id, data FROM nodes"):
+            yield node_id, _decode_node(data, node_id)
+    
     def get_all_nodes(self) -> Dict[str, Dict[str, Any]]:
-        """Load all nodes from disk"""
-        nodes = {}
-        for node_file in self.nodes_dir.glob("*.json"):
-            node_id = node_file.stem
-            with open(node_file, 'r', encoding='utf-8') as f:
-                nodes[node_id] = json.load(f)
-        
-        self._node_cache = nodes
-        return nodes
+        """Load all nodes from the node database"""
+        return dict(self.iter_nodes())
     
     # ==================== Edge Operations ====================
     
@@ -169,14 +427,9 @@ class LocalGraphStore:
         }
         
         # Check for duplicates
-        existing = [
-            e for e in self._edge_cache
-            if e["source"] == source_id and e["target"] == target_id and e["relation"] == relation
-        ]
-        
-        if not existing:
-            self._edge_cache.append(edge)
-            self._index["edge_count"] = len(self._edge_cache)
+        if (source_id, target_id, relation) not in self._edges:
+            self._add_edge_entry(edge)
+            self._index["edge_count"] = len(self._edges)
             self._save_edges()
             self._save_index()
     
@@ -187,18 +440,26 @@ class LocalGraphStore:
         relation: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """Get edges with optional filters"""
-        edges = self._edge_cache
-        
-        if source_id:
-            edges = [e for e in edges if e["source"] == source_id]
-        
-        if target_id:
-            edges = [e for e in edges if e["target"] == target_id]
+        candidates = [
+            index.get(value, {})
+            for index, value in (
+                (self._by_source, source_id),
+                (self._by_target, target_id),
+                (self._by_relation, relation)
+            )
+            if value
+        ]
         
-        if relation:
-            edges = [e for e in edges if e["relation"] == relation]
+        if not candidates:
+            return list(self._edges.values())
         
-        return edges
+        # Walk the smallest candidate set, check membership in the others
+        candidates.sort(key=len)
+        smallest, others = candidates[0], candidates[1:]
+        return [
+            self._edges[key] for key in smallest
+            if all(key in other for other in others)
+        ]
     
     def delete_edge(
         self,
@@ -207,23 +468,19 @@ class LocalGraphStore:
         relation: Optional[str] = None
     ) -> int:
         """Delete edge(s) matching the criteria. Returns count deleted."""
-        initial_count = len(self._edge_cache)
-        
         if relation:
-            self._edge_cache = [
-                e for e in self._edge_cache
-                if not (e["source"] == source_id and e["target"] == target_id and e["relation"] == relation)
-            ]
+            keys = [(source_id, target_id, relation)] if (source_id, target_id, relation) in self._edges else []
         else:
-            self._edge_cache = [
-                e for e in self._edge_cache
-                if not (e["source"] == source_id and e["target"] == target_id)
-            ]
+            target_keys = self._by_target.get(target_id, {})
+            keys = [key for key in self._by_source.get(source_id, {}) if key in target_keys]
+        
+        for key in keys:
+            self._remove_edge_entry(key)
         
-        deleted_count = initial_count - len(self._edge_cache)
+        deleted_count = len(keys)
         
         if deleted_count > 0:
-            self._index["edge_count"] = len(self._edge_cache)
+            self._index["edge_count"] = len(self._edges)
             self._save_edges()
             self._save_index()
         
@@ -247,21 +504,17 @@ class LocalGraphStore:
         backup_dir = self.base_dir / "backups" / backup_name
         backup_dir.mkdir(parents=True, exist_ok=True)
         
-        # Copy all data
-        import shutil
-        
-        # Copy nodes
-        nodes_backup = backup_dir / "nodes"
-        if self.nodes_dir.exists():
-            shutil.copytree(self.nodes_dir, nodes_backup)
+        # Copy nodes (consistent snapshot through the SQLite backup API)
+        backup_conn = sqlite3.connect(str(backup_dir / "nodes.db"))
+        self._conn.backup(backup_conn)
+        backup_conn.close()
         
-        # Copy edges
+        # Link edges and index (replaced atomically on write, so sharing is safe)
         if self.edges_file.exists():
-            shutil.copy(self.edges_file, backup_dir / "edges.json")
+            _link_or_copy(self.edges_file, backup_dir / "edges.json")
         
-        # Copy index
         if self.index_file.exists():
-            shutil.copy(self.index_file, backup_dir / "index.json")
+            _link_or_copy(self.index_file, backup_dir / "index.json")
         
         # Save backup metadata
         metadata = {
@@ -272,8 +525,8 @@ class LocalGraphStore:
             "patient_count": len(self._index.get("patients", {}))
         }
         
-        with open(backup_dir / "metadata.json", 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2)
+        with open(backup_dir / "metadata.json", 'wb') as f:
+            f.write(_dumps(metadata, pretty=True))
         
         return str(backup_dir)
     
@@ -284,33 +537,37 @@ class LocalGraphStore:
         if not backup_dir.exists():
             return False
         
-        import shutil
-        
-        # Clear current data
-        if self.nodes_dir.exists():
-            shutil.rmtree(self.nodes_dir)
-        
         # Restore nodes
-        nodes_backup = backup_dir / "nodes"
+        nodes_backup = backup_dir / "nodes.db"
+        legacy_nodes_backup = backup_dir / "nodes"
         if nodes_backup.exists():
-            shutil.copytree(nodes_backup, self.nodes_dir)
+            backup_conn = sqlite3.connect(str(nodes_backup))
+            backup_conn.backup(self._conn)
+            backup_conn.close()
         else:
-            self.nodes_dir.mkdir()
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.execute("DELETE FROM nodes")
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO nodes (id, data) VALUES (?, ?)",
+                    ((f.stem, f.read_bytes()) for f in legacy_nodes_backup.glob("*.json"))
+                )
         
         # Restore edges
         edges_backup = backup_dir / "edges.json"
         if edges_backup.exists():
-            shutil.copy(edges_backup, self.edges_file)
+            _link_or_copy(edges_backup, self.edges_file)
         
         # Restore index
         index_backup = backup_dir / "index.json"
         if index_backup.exists():
-            shutil.copy(index_backup, self.index_file)
+            _link_or_copy(index_backup, self.index_file)
         
         # Reload caches
         self._node_cache.clear()
         self._load_index()
         self._load_edges()
+        self._index["node_bytes"] = self._sum_node_bytes()
         
         return True
     
@@ -324,20 +581,32 @@ class LocalGraphStore:
                 if backup_dir.is_dir():
                     metadata_file = backup_dir / "metadata.json"
                     if metadata_file.exists():
-                        with open(metadata_file, 'r', encoding='utf-8') as f:
-                            backups.append(json.load(f))
+                        with open(metadata_file, 'rb') as f:
+                            backups.append(_loads(f.read()))
         
         return sorted(backups, key=lambda x: x.get("created_at", ""), reverse=True)
     
+    def export_json(self, output_path: str) -> str:
+        """Export nodes, edges and index as one human-readable JSON file"""
+        export = {
+            "nodes": self.get_all_nodes(),
+            "edges": self.get_edges(),
+            "index": self._index
+        }
+        _atomic_write(Path(output_path), _dumps(export, pretty=True))
+        return output_path
+    
     # ==================== Statistics ====================
     
     def get_statistics(self) -> Dict[str, Any]:
-        """Get storage statistics"""
-        # Calculate storage size
-        total_size = 0
-        for f in self.base_dir.rglob("*"):
-            if f.is_file():
-                total_size += f.stat().st_size
+        """
+        Get storage statistics.
+        
+        storage_size_bytes is the payload size of the live data (node blobs plus
+        the edges/index files), tracked on every write so no directory walk is
+        needed. It excludes SQLite page overhead and backups.
+        """
+        total_size = self._index.get("node_bytes", 0) + self._edges_bytes + self._index_bytes
         
         return {
             "base_dir": str(self.base_dir),
@@ -352,15 +621,16 @@ class LocalGraphStore:
     
     def clear(self) -> None:
         """Clear all data (use with caution!)"""
-        import shutil
-        
         # Clear nodes
+        self._conn.execute("DELETE FROM nodes")
         if self.nodes_dir.exists():
             shutil.rmtree(self.nodes_dir)
-            self.nodes_dir.mkdir()
         
         # Clear edges
-        self._edge_cache = []
+        self._edges.clear()
+        self._by_source.clear()
+        self._by_target.clear()
+        self._by_relation.clear()
         self._save_edges()
         
         # Reset index
@@ -368,9 +638,26 @@ class LocalGraphStore:
             "patients": {},
             "node_count": 0,
             "edge_count": 0,
+            "node_bytes": 0,
             "last_updated": None
         }
         self._save_index()
         
         # Clear cache
         self._node_cache.clear()
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Inspect a local graph store")
+    parser.add_argument("--base-dir", default="./data/graph_store", help="Graph store directory")
+    parser.add_argument("--export-json", metavar="PATH", help="Write the whole store as indented JSON")
+    args = parser.parse_args()
+    
+    store = LocalGraphStore(base_dir=args.base_dir)
+    if args.export_json:
+        print(f"Exported to {store.export_json(args.export_json)}")
+    else:
+        print(_dumps(store.get_statistics(), pretty=True).decode("utf-8"))
+    store.close()
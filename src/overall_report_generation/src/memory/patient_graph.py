@@ -4,11 +4,20 @@ Stores and retrieves patient medical history using a knowledge graph structure
 """
 
 from datetime import datetime
-from typing import Dict, Any, List, Optional, Tuple
-from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional, Tuple, Set, FrozenSet
+from bisect import bisect_left, insort
+from collections import Counter, OrderedDict, defaultdict
+from dataclasses import dataclass, field, fields
 from enum import Enum
+from functools import lru_cache
+from itertools import chain
+import asyncio
 import json
 import hashlib
+import math
+import re
+import sys
+import time
 
 # Try to import LlamaIndex components
 try:
@@ -22,6 +31,143 @@ except ImportError:
 
 # NetworkX for local graph storage (always available as fallback)
 import networkx as nx
+import numpy as np
+
+# Optional: faster (de)serialization of saved graphs
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Optional: FAISS flat inner-product index for embedding search
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+# Format version written in the first line of saved graph files
+GRAPH_FILE_VERSION = 1
+
+# Word tokens for the keyword search index
+TOKEN_RE = re.compile(r"\w+")
+# ASCII characters outside \w, mapped to spaces for the str.split fast path
+_NON_WORD_TO_SPACE = str.maketrans({
+    c: " " for c in map(chr, range(128)) if not (c.isalnum() or c == "_")
+})
+
+# Result caches (invalidated whenever the graph changes)
+SUMMARY_CACHE_SIZE = 512
+SEARCH_CACHE_SIZE = 256
+RELATED_CACHE_SIZE = 256
+QUERY_EMBED_CACHE_SIZE = 256
+# Cosine similarity above which two queries are served the same results
+SEMANTIC_CACHE_THRESHOLD = 0.95
+# Embedding batch calls kept in flight by an async flush
+EMBED_CONCURRENCY = 4
+# Okapi BM25 parameters for lexical_search
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+@lru_cache(maxsize=8192)
+def _generate_node_id(node_type_value: str, patient_id: str, name: str) -> str:
+    """12 hex chars identifying a node (the same IDs recur on context rebuilds)"""
+    key = f"{node_type_value}:{patient_id}:{name}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=6).hexdigest()
+
+
+def _legacy_node_id(node_type_value: str, patient_id: str, name: str) -> str:
+    """Node ID scheme of graphs saved before the line-delimited format (truncated MD5)"""
+    key = f"{node_type_value}:{patient_id}:{name}"
+    return hashlib.md5(key.encode()).hexdigest()[:12]
+
+
+def _legacy_id_key(node_type_value: str, node_data: Dict[str, Any]) -> Optional[str]:
+    """The name that was hashed into a legacy node ID, None if it cannot be rebuilt"""
+    data = node_data.get("data") or {}
+    if node_type_value == "patient":
+        return data.get("patient_id")
+    if node_type_value == "condition":
+        return f"allergy_{data.get('allergen')}" if data.get("is_allergy") else node_data.get("name")
+    if node_type_value == "medication":
+        return node_data.get("name")
+    if node_type_value == "event":
+        return f"{data.get('event_type')}_{data.get('timestamp')}"
+    if node_type_value == "consultation":
+        return f"consultation_{data.get('timestamp')}"
+    if node_type_value == "report":
+        return f"report_{data.get('report_type')}_{data.get('timestamp')}"
+    return None
+
+
+def _migrate_legacy_ids(
+    nodes: Dict[str, Dict[str, Any]],
+    edges: List[Any],
+    patients: Dict[str, str],
+) -> Dict[str, str]:
+    """
+    Map the MD5 node IDs of a legacy graph to the current scheme.
+
+    A node is only remapped when its stored ID is reproduced by hashing the
+    rebuilt key with MD5; anything else keeps its ID.
+    """
+    patient_ids = {nid: pid for pid, nid in patients.items()}
+    owners: Dict[str, str] = {}
+    for source, target, _ in edges:
+        if source in patient_ids:
+            owners.setdefault(target, patient_ids[source])
+    
+    id_map: Dict[str, str] = {}
+    for nid, node_data in nodes.items():
+        type_value = node_data.get("node_type")
+        type_value = getattr(type_value, "value", type_value)
+        name = _legacy_id_key(type_value, node_data)
+        if name is None:
+            continue
+        if type_value == "patient":
+            candidates: Tuple[str, ...] = ("",)
+        elif nid in owners:
+            candidates = (owners[nid],)
+        else:
+            candidates = (*patients, "")
+        for patient_id in candidates:
+            if _legacy_node_id(type_value, patient_id, name) == nid:
+                id_map[nid] = _generate_node_id(type_value, patient_id, name)
+                break
+    return id_map
+
+
+def _json_line(obj: Any) -> bytes:
+    """One compact JSON document terminated by a newline"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+def _json_loads(data: bytes) -> Any:
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _timestamp_epoch(value: Any) -> Optional[float]:
+    """Epoch seconds of an ISO timestamp string, None if it is not one"""
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+
+
+def _tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens of a text"""
+    text = text.lower()
+    if text.isascii():
+        return text.translate(_NON_WORD_TO_SPACE).split()
+    return TOKEN_RE.findall(text)
 
 
 class RelationType(str, Enum):
@@ -65,23 +211,61 @@ class NodeType(str, Enum):
     PROCEDURE = "procedure"
 
 
-class PatientNode(BaseModel):
+# Enum values resolved once: hot paths look them up here instead of `.value`
+NODE_TYPE_VALUES = {nt: sys.intern(nt.value) for nt in NodeType}
+RELATION_VALUES = {rt: sys.intern(rt.value) for rt in RelationType}
+_HAS_ALLERGY = RELATION_VALUES[RelationType.HAS_ALLERGY]
+
+# Small int code per relation, used by the CSR adjacency snapshot
+RELATION_CODES = {rt: i for i, rt in enumerate(RelationType)}
+_RELATION_CODES_BY_VALUE = {rt.value: code for rt, code in RELATION_CODES.items()}
+
+# get_patient_context section for each node type linked from a patient
+PATIENT_CONTEXT_SECTIONS = {
+    NodeType.CONDITION: "conditions",
+    NodeType.MEDICATION: "medications",
+    NodeType.EVENT: "recent_events",
+    NodeType.CONSULTATION: "consultations",
+    NodeType.REPORT: "reports",
+}
+
+
+@dataclass(slots=True)
+class PatientNode:
     """A node in the patient knowledge graph"""
-    id: str = Field(..., description="Unique node identifier")
-    node_type: NodeType = Field(..., description="Type of node")
-    name: str = Field(..., description="Node name/label")
+    id: str  # Unique node identifier
+    node_type: NodeType
+    name: str  # Node name/label
     
     # Content
-    description: str = Field(default="", description="Node description")
-    data: Dict[str, Any] = Field(default_factory=dict, description="Node data/attributes")
+    description: str = ""
+    data: Dict[str, Any] = field(default_factory=dict)  # Node data/attributes
     
-    # Metadata
-    created_at: datetime = Field(default_factory=datetime.now)
-    updated_at: datetime = Field(default_factory=datetime.now)
-    source: str = Field(default="system", description="Data source")
+    # Metadata (epoch nanoseconds; see created_at_dt / updated_at_dt)
+    created_at: int = field(default_factory=time.time_ns)
+    updated_at: int = field(default_factory=time.time_ns)
+    source: str = "system"  # Data source
     
     # For embedding/search
-    embedding_text: str = Field(default="", description="Text for embedding generation")
+    embedding_text: str = ""  # Text for embedding generation
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Field dict of the node; node_type stays a NodeType, data is copied"""
+        result = {name: getattr(self, name) for name in _PATIENT_NODE_FIELDS}
+        result["data"] = dict(self.data)
+        return result
+    
+    @classmethod
+    def from_dict(cls, node_data: Dict[str, Any]) -> "PatientNode":
+        """Build a node from to_dict() output or a saved graph"""
+        values = dict(node_data)
+        values["node_type"] = NodeType(values["node_type"])
+        for key in ("created_at", "updated_at"):
+            value = values.get(key)
+            if isinstance(value, str):
+                # Graphs saved before the epoch timestamps stored ISO strings
+                values[key] = round(datetime.fromisoformat(value).timestamp() * 1e6) * 1000
+        return cls(**values)
     
     def generate_embedding_text(self) -> str:
         """Generate text representation for embedding"""
@@ -99,11 +283,56 @@ class PatientNode(BaseModel):
         self.embedding_text = " | ".join(parts)
         return self.embedding_text
     
+    @property
+    def created_at_dt(self) -> datetime:
+        return datetime.fromtimestamp(self.created_at / 1e9)
+    
+    @property
+    def updated_at_dt(self) -> datetime:
+        return datetime.fromtimestamp(self.updated_at / 1e9)
+    
     @staticmethod
     def generate_id(node_type: NodeType, name: str, patient_id: str = "") -> str:
         """Generate a consistent node ID"""
-        key = f"{node_type.value}:{patient_id}:{name}"
-        return hashlib.md5(key.encode()).hexdigest()[:12]
+        return _generate_node_id(node_type.value, patient_id, name)
+
+
+_PATIENT_NODE_FIELDS: Tuple[str, ...] = tuple(f.name for f in fields(PatientNode))
+
+
+class _AdjacencyCSR:
+    """
+    Read-only compressed-sparse-row copy of the graph's out-edges.
+    
+    Targets and relation codes of node row i are the slices
+    indptr[i]:indptr[i + 1], in the graph's own edge order.
+    """
+    
+    def __init__(self, graph: nx.MultiDiGraph):
+        self.ids: List[str] = list(graph.nodes)
+        self.row: Dict[str, int] = {nid: i for i, nid in enumerate(self.ids)}
+        
+        n_edges = graph.number_of_edges()
+        sources = np.empty(n_edges, dtype=np.int64)
+        self.targets = np.empty(n_edges, dtype=np.int32)
+        self.relations = np.empty(n_edges, dtype=np.int8)
+        for i, (u, v, relation) in enumerate(graph.edges(data="relation")):
+            sources[i] = self.row[u]
+            self.targets[i] = self.row[v]
+            self.relations[i] = _RELATION_CODES_BY_VALUE.get(relation, -1)
+        # graph.edges already yields edges grouped by source
+        self.indptr = np.zeros(len(self.ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(self.ids)), out=self.indptr[1:])
+    
+    def out_edges(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Concatenated (targets, relation codes) of the given rows, row by row"""
+        slices = [slice(self.indptr[r], self.indptr[r + 1]) for r in rows]
+        if not slices:
+            return self.targets[:0], self.relations[:0]
+        return (
+            np.concatenate([self.targets[s] for s in slices]),
+            np.concatenate([self.relations[s] for s in slices])
+        )
 
 
 class PatientGraphRAG:
@@ -120,14 +349,30 @@ class PatientGraphRAG:
     - Graph-based traversal for connected information
     """
     
-    def __init__(self, persist_dir: Optional[str] = None):
+    def __init__(
+        self,
+        persist_dir: Optional[str] = None,
+        embed_model: Optional[Any] = None,
+        embed_batch_size: int = 64,
+        embed_concurrency: int = EMBED_CONCURRENCY,
+        quantize_embeddings: bool = False
+    ):
         """
         Initialize the PatientGraphRAG.
         
         Args:
             persist_dir: Directory for persisting the graph (optional)
+            embed_model: LlamaIndex embedding model; enables semantic search (optional)
+            embed_batch_size: Number of pending nodes embedded per batch call
+            embed_concurrency: Batch calls run concurrently when the model has aget_text_embedding_batch
+            quantize_embeddings: Keep vectors as int8 with a per-vector scale (4x less memory;
+                uses the NumPy scan instead of FAISS)
         """
         self.persist_dir = persist_dir
+        self.embed_model = embed_model
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+        self.quantize_embeddings = quantize_embeddings
         
         # Initialize NetworkX graph
         self.graph = nx.MultiDiGraph()
@@ -143,6 +388,54 @@ class PatientGraphRAG:
         # Patient registry
         self.patients: Dict[str, str] = {}  # patient_id -> node_id
         
+        # Keyword search index, maintained by _index_node
+        self._inverted: Dict[str, Set[str]] = defaultdict(set)  # token -> node ids
+        self._node_tokens: Dict[str, FrozenSet[str]] = {}  # node id -> tokens
+        self._by_type: Dict[NodeType, Set[str]] = defaultdict(set)
+        self._node_seq: Dict[str, int] = {}  # insertion order, for stable ranking
+        # BM25 index over "name description": token -> {node id: term frequency}
+        self._bm25_postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._bm25_lengths: Dict[str, int] = {}  # node id -> token count
+        self._bm25_terms: Dict[str, Tuple[str, ...]] = {}  # node id -> distinct tokens
+        self._bm25_total_length = 0
+        # (epoch, -seq, node_id) of every node with an ISO data["timestamp"], ascending
+        self._ts_index: List[Tuple[float, int, str]] = []
+        self._ts_keys: Dict[str, Tuple[float, int, str]] = {}
+        # Array views of _ts_index and per-patient reachability masks over it,
+        # each stamped with the graph version it was built for
+        self._ts_arrays: Optional[Tuple[int, np.ndarray, List[str]]] = None
+        self._ts_masks: Dict[str, Tuple[int, np.ndarray]] = {}
+        self._node_dumps: Dict[str, Dict[str, Any]] = {}  # to_dict() per node, built on first use
+        
+        # patient node id -> context section -> linked node ids (dict as ordered set)
+        self._patient_buckets: Dict[str, Dict[str, Dict[str, None]]] = defaultdict(dict)
+        
+        # CSR copy of the out-edges for traversals, rebuilt on first read after a write
+        self._csr: Optional[_AdjacencyCSR] = None
+        
+        # node id -> ids with a directed path to or from it; cleared on every new edge
+        self._reach_cache: Dict[str, Set[str]] = {}
+        
+        # Embedding search: nodes wait in _pending_embed and are embedded in
+        # batches; vectors are L2-normalized so inner product = cosine
+        self._pending_embed: List[str] = []
+        self._faiss_index = None
+        self._vectors: Optional[np.ndarray] = None  # used when FAISS is missing; grows by doubling
+        self._vector_scales: Optional[np.ndarray] = None  # per-row scale of int8 _vectors
+        self._row_to_id: List[str] = []
+        self._id_to_row: Dict[str, int] = {}
+        
+        # Summary/search result caches, valid for one graph version
+        self._version = 0
+        self._cache_version = 0
+        self._summary_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._search_cache: "OrderedDict[Tuple, List[Dict[str, Any]]]" = OrderedDict()
+        self._query_cache: "OrderedDict[int, Tuple[np.ndarray, Tuple, List[Dict[str, Any]]]]" = OrderedDict()
+        self._query_cache_seq = 0
+        self._related_cache: "OrderedDict[Tuple, Tuple[PatientNode, ...]]" = OrderedDict()
+        # query text -> embedding; independent of graph version (only the model matters)
+        self._query_embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        
     def _init_llamaindex(self) -> None:
         """Initialize LlamaIndex components"""
         try:
@@ -194,20 +487,13 @@ class PatientGraphRAG:
         self._add_node(patient_node)
         self.patients[patient_id] = node_id
         
-        # Add conditions as connected nodes
-        if conditions:
-            for condition in conditions:
-                self.add_condition(patient_id, condition)
-        
-        # Add medications
-        if medications:
-            for med in medications:
-                self.add_medication(patient_id, med)
-        
-        # Add allergies
-        if allergies:
-            for allergy in allergies:
-                self.add_allergy(patient_id, allergy)
+        # Conditions, medications and allergies go in as one batch
+        linked = [
+            *((self._condition_node(patient_id, c), RelationType.HAS_CONDITION) for c in conditions or ()),
+            *((self._medication_node(patient_id, m), RelationType.HAS_MEDICATION) for m in medications or ()),
+            *((self._allergy_node(patient_id, a), RelationType.HAS_ALLERGY) for a in allergies or ()),
+        ]
+        self._bulk_add(node_id, linked)
         
         return node_id
     
@@ -220,6 +506,29 @@ class PatientGraphRAG:
         icd_code: Optional[str] = None
     ) -> str:
         """Add a medical condition for a patient"""
+        condition_node = self._condition_node(patient_id, condition_name, severity, diagnosed_date, icd_code)
+        node_id = condition_node.id
+        
+        self._add_node(condition_node)
+        
+        # Create relationship to patient
+        if patient_id in self.patients:
+            self._add_edge(
+                self.patients[patient_id],
+                node_id,
+                RelationType.HAS_CONDITION
+            )
+        
+        return node_id
+    
+    @staticmethod
+    def _condition_node(
+        patient_id: str,
+        condition_name: str,
+        severity: Optional[str] = None,
+        diagnosed_date: Optional[str] = None,
+        icd_code: Optional[str] = None
+    ) -> PatientNode:
         node_id = PatientNode.generate_id(NodeType.CONDITION, condition_name, patient_id)
         
         condition_node = PatientNode(
@@ -234,27 +543,37 @@ class PatientGraphRAG:
             }
         )
         condition_node.generate_embedding_text()
+        return condition_node
+    
+    def add_medication(
+        self,
+        patient_id: str,
+        medication_name: str,
+        dosage: Optional[str] = None,
+        frequency: Optional[str] = None
+    ) -> str:
+        """Add a medication for a patient"""
+        med_node = self._medication_node(patient_id, medication_name, dosage, frequency)
+        node_id = med_node.id
         
-        self._add_node(condition_node)
+        self._add_node(med_node)
         
-        # Create relationship to patient
         if patient_id in self.patients:
             self._add_edge(
                 self.patients[patient_id],
                 node_id,
-                RelationType.HAS_CONDITION
+                RelationType.HAS_MEDICATION
             )
         
         return node_id
     
-    def add_medication(
-        self,
+    @staticmethod
+    def _medication_node(
         patient_id: str,
         medication_name: str,
         dosage: Optional[str] = None,
         frequency: Optional[str] = None
-    ) -> str:
-        """Add a medication for a patient"""
+    ) -> PatientNode:
         node_id = PatientNode.generate_id(NodeType.MEDICATION, medication_name, patient_id)
         
         med_node = PatientNode(
@@ -268,26 +587,37 @@ class PatientGraphRAG:
             }
         )
         med_node.generate_embedding_text()
+        return med_node
+    
+    def add_allergy(
+        self,
+        patient_id: str,
+        allergen: str,
+        severity: str = "moderate",
+        reaction: Optional[str] = None
+    ) -> str:
+        """Add an allergy for a patient"""
+        allergy_node = self._allergy_node(patient_id, allergen, severity, reaction)
+        node_id = allergy_node.id
         
-        self._add_node(med_node)
+        self._add_node(allergy_node)
         
         if patient_id in self.patients:
             self._add_edge(
                 self.patients[patient_id],
                 node_id,
-                RelationType.HAS_MEDICATION
+                RelationType.HAS_ALLERGY
             )
         
         return node_id
     
-    def add_allergy(
-        self,
+    @staticmethod
+    def _allergy_node(
         patient_id: str,
         allergen: str,
         severity: str = "moderate",
         reaction: Optional[str] = None
-    ) -> str:
-        """Add an allergy for a patient"""
+    ) -> PatientNode:
         node_id = PatientNode.generate_id(NodeType.CONDITION, f"allergy_{allergen}", patient_id)
         
         allergy_node = PatientNode(
@@ -303,17 +633,7 @@ class PatientGraphRAG:
             }
         )
         allergy_node.generate_embedding_text()
-        
-        self._add_node(allergy_node)
-        
-        if patient_id in self.patients:
-            self._add_edge(
-                self.patients[patient_id],
-                node_id,
-                RelationType.HAS_ALLERGY
-            )
-        
-        return node_id
+        return allergy_node
     
     # ==================== Event Management ====================
     
@@ -333,9 +653,10 @@ class PatientGraphRAG:
         Events include: vital anomalies, alerts, consultations, procedures
         """
         timestamp = timestamp or datetime.now()
+        iso_timestamp = timestamp.isoformat()
         node_id = PatientNode.generate_id(
             NodeType.EVENT,
-            f"{event_type}_{timestamp.isoformat()}",
+            f"{event_type}_{iso_timestamp}",
             patient_id
         )
         
@@ -347,13 +668,15 @@ class PatientGraphRAG:
             data={
                 "event_type": event_type,
                 "severity": severity,
-                "timestamp": timestamp.isoformat(),
+                "timestamp": iso_timestamp,
                 **(data or {})
             }
         )
         event_node.generate_embedding_text()
         
-        self._add_node(event_node)
+        # The epoch is known here; skip re-parsing unless data overrode the timestamp
+        overridden = data is not None and "timestamp" in data
+        self._add_node(event_node, ts_epoch=None if overridden else timestamp.timestamp())
         
         # Link to patient
         if patient_id in self.patients:
@@ -386,9 +709,10 @@ class PatientGraphRAG:
     ) -> str:
         """Add a consultation record"""
         timestamp = timestamp or datetime.now()
+        iso_timestamp = timestamp.isoformat()
         node_id = PatientNode.generate_id(
             NodeType.CONSULTATION,
-            f"consultation_{timestamp.isoformat()}",
+            f"consultation_{iso_timestamp}",
             patient_id
         )
         
@@ -404,12 +728,12 @@ class PatientGraphRAG:
                 "diagnosis": diagnosis,
                 "treatment": treatment,
                 "provider": provider,
-                "timestamp": timestamp.isoformat()
+                "timestamp": iso_timestamp
             }
         )
         consultation_node.generate_embedding_text()
         
-        self._add_node(consultation_node)
+        self._add_node(consultation_node, ts_epoch=timestamp.timestamp())
         
         if patient_id in self.patients:
             self._add_edge(
@@ -430,9 +754,10 @@ class PatientGraphRAG:
     ) -> str:
         """Add a generated report to the graph"""
         timestamp = timestamp or datetime.now()
+        iso_timestamp = timestamp.isoformat()
         node_id = PatientNode.generate_id(
             NodeType.REPORT,
-            f"report_{report_type}_{timestamp.isoformat()}",
+            f"report_{report_type}_{iso_timestamp}",
             patient_id
         )
         
@@ -444,12 +769,12 @@ class PatientGraphRAG:
             data={
                 "report_type": report_type,
                 "content": content,
-                "timestamp": timestamp.isoformat()
+                "timestamp": iso_timestamp
             }
         )
         report_node.generate_embedding_text()
         
-        self._add_node(report_node)
+        self._add_node(report_node, ts_epoch=timestamp.timestamp())
         
         if patient_id in self.patients:
             self._add_edge(
@@ -462,15 +787,361 @@ class PatientGraphRAG:
     
     # ==================== Graph Operations ====================
     
-    def _add_node(self, node: PatientNode) -> None:
-        """Add a node to both storage and graph"""
-        self.nodes[node.id] = node
+    def _add_node(self, node: PatientNode, ts_epoch: Optional[float] = None) -> None:
+        """Add a node to both storage and graph (ts_epoch: data["timestamp"] as epoch, if known)"""
+        self._version += 1
+        self._csr = None
+        self._register_node(node, ts_epoch)
+        # The full node lives in self.nodes; the graph only carries labels
         self.graph.add_node(
             node.id,
-            type=node.node_type.value,
-            name=node.name,
-            data=node.model_dump()
+            type=NODE_TYPE_VALUES[node.node_type],
+            name=node.name
+        )
+        self._maybe_flush_embeddings()
+    
+    def _register_node(self, node: PatientNode, ts_epoch: Optional[float] = None) -> None:
+        """Store and index a node (everything but the NetworkX update)"""
+        self._index_node(node, ts_epoch)
+        self.nodes[node.id] = node
+        self._node_dumps.pop(node.id, None)
+        if self.embed_model is not None:
+            self._pending_embed.append(node.id)
+    
+    def _maybe_flush_embeddings(self) -> None:
+        if len(self._pending_embed) >= self.embed_batch_size:
+            self.flush_embeddings()
+    
+    def _bulk_add(self, source_id: str, items: List[Tuple[PatientNode, RelationType]]) -> None:
+        """Add many nodes, each linked from source_id, with one NetworkX call for each"""
+        if not items:
+            return
+        self._version += 1
+        self._csr = None
+        self._reach_cache.clear()
+        
+        for node, _ in items:
+            self._register_node(node)
+        self.graph.add_nodes_from(
+            (node.id, {"type": NODE_TYPE_VALUES[node.node_type], "name": node.name})
+            for node, _ in items
         )
+        created_at = time.time_ns()
+        self.graph.add_edges_from(
+            (source_id, node.id, {"relation": RELATION_VALUES[relation], "data": {}, "created_at": created_at})
+            for node, relation in items
+        )
+        for node, relation in items:
+            self._bucket_edge(source_id, node.id, RELATION_VALUES[relation])
+        self._maybe_flush_embeddings()
+    
+    def _node_dump(self, node_id: str) -> Dict[str, Any]:
+        """to_dict() of a node, computed once per node version (do not mutate)"""
+        dump = self._node_dumps.get(node_id)
+        if dump is None:
+            dump = self.nodes[node_id].to_dict()
+            self._node_dumps[node_id] = dump
+        return dump
+    
+    def _index_node(self, node: PatientNode, ts_epoch: Optional[float] = None) -> None:
+        """(Re)index a node's embedding text, type and timestamp for search"""
+        old_tokens = self._node_tokens.get(node.id, frozenset())
+        tokens = frozenset(_tokenize(node.embedding_text))
+        for token in old_tokens - tokens:
+            postings = self._inverted[token]
+            postings.discard(node.id)
+            if not postings:
+                del self._inverted[token]
+        for token in tokens - old_tokens:
+            self._inverted[token].add(node.id)
+        self._node_tokens[node.id] = tokens
+        self._index_bm25(node)
+        
+        previous = self.nodes.get(node.id)
+        if previous is not None and previous.node_type != node.node_type:
+            self._by_type[previous.node_type].discard(node.id)
+        self._by_type[node.node_type].add(node.id)
+        seq = self._node_seq.setdefault(node.id, len(self._node_seq))
+        
+        old_key = self._ts_keys.pop(node.id, None)
+        if old_key is not None:
+            del self._ts_index[bisect_left(self._ts_index, old_key)]
+        epoch = ts_epoch if ts_epoch is not None else _timestamp_epoch(node.data.get("timestamp"))
+        if epoch is not None:
+            # -seq: walking the index backwards yields equal timestamps in insertion order
+            key = (epoch, -seq, node.id)
+            insort(self._ts_index, key)
+            self._ts_keys[node.id] = key
+    
+    def _index_bm25(self, node: PatientNode) -> None:
+        old_length = self._bm25_lengths.pop(node.id, None)
+        if old_length is not None:
+            self._bm25_total_length -= old_length
+            for token in self._bm25_terms.pop(node.id):
+                postings = self._bm25_postings[token]
+                del postings[node.id]
+                if not postings:
+                    del self._bm25_postings[token]
+        
+        tokens = _tokenize(f"{node.name} {node.description}")
+        term_counts = Counter(tokens)
+        for token, tf in term_counts.items():
+            self._bm25_postings[token][node.id] = tf
+        self._bm25_terms[node.id] = tuple(term_counts)
+        self._bm25_lengths[node.id] = len(tokens)
+        self._bm25_total_length += len(tokens)
+    
+    def recent_nodes(
+        self,
+        cutoff: float,
+        patient_id: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[PatientNode]:
+        """
+        Nodes whose data["timestamp"] is at or after cutoff (epoch seconds), newest first.
+        
+        With patient_id, only nodes connected to that patient are returned.
+        """
+        epochs, ids = self._timestamp_arrays()
+        start = int(np.searchsorted(epochs, cutoff, side="left"))
+        patient_node_id = self.patients.get(patient_id) if patient_id else None
+        if patient_node_id:
+            positions = start + np.flatnonzero(self._timestamp_reach_mask(patient_node_id)[start:])
+        else:
+            positions = np.arange(start, len(ids))
+        positions = positions[::-1][:limit]
+        return [self.nodes[ids[i]] for i in positions]
+    
+    def _timestamp_arrays(self) -> Tuple[np.ndarray, List[str]]:
+        """(epochs, node ids) of _ts_index as arrays, rebuilt once per graph version"""
+        if self._ts_arrays is None or self._ts_arrays[0] != self._version:
+            epochs = np.fromiter((key[0] for key in self._ts_index), dtype=np.float64, count=len(self._ts_index))
+            self._ts_arrays = (self._version, epochs, [key[2] for key in self._ts_index])
+        return self._ts_arrays[1], self._ts_arrays[2]
+    
+    def _timestamp_reach_mask(self, patient_node_id: str) -> np.ndarray:
+        """Boolean mask over _timestamp_arrays() of nodes connected to a patient"""
+        cached = self._ts_masks.get(patient_node_id)
+        if cached is None or cached[0] != self._version:
+            _, ids = self._timestamp_arrays()
+            connected = self._connected_ids(patient_node_id)
+            mask = np.fromiter((nid in connected for nid in ids), dtype=bool, count=len(ids))
+            cached = (self._version, mask)
+            self._ts_masks[patient_node_id] = cached
+        return cached[1]
+    
+    def flush_embeddings(self) -> int:
+        """
+        Embed all pending nodes in batched calls and add them to the vector index.
+        
+        Returns the number of nodes embedded.
+        """
+        chunks = self._take_pending_chunks()
+        if not chunks:
+            return 0
+        
+        batches = None
+        if len(chunks) > 1 and self._can_embed_async():
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                batches = asyncio.run(self._aembed_chunks(chunks))
+            # Inside a running event loop asyncio.run is not allowed:
+            # fall through to sequential calls (or await aflush_embeddings)
+        if batches is None:
+            batches = (
+                self.embed_model.get_text_embedding_batch([self.nodes[nid].embedding_text for nid in chunk])
+                for chunk in chunks
+            )
+        return self._add_batches(chunks, batches)
+    
+    async def aflush_embeddings(self) -> int:
+        """flush_embeddings() for callers already running an event loop"""
+        chunks = self._take_pending_chunks()
+        if not chunks:
+            return 0
+        if self._can_embed_async():
+            batches = await self._aembed_chunks(chunks)
+        else:
+            batches = [
+                self.embed_model.get_text_embedding_batch([self.nodes[nid].embedding_text for nid in chunk])
+                for chunk in chunks
+            ]
+        return self._add_batches(chunks, batches)
+    
+    def _take_pending_chunks(self) -> List[List[str]]:
+        """Dequeue pending node ids, split into embed_batch_size chunks"""
+        if self.embed_model is None or not self._pending_embed:
+            return []
+        
+        # A node updated before the flush is embedded once, with its latest text
+        pending = [nid for nid in dict.fromkeys(self._pending_embed) if nid in self.nodes]
+        self._pending_embed = []
+        return [
+            pending[start:start + self.embed_batch_size]
+            for start in range(0, len(pending), self.embed_batch_size)
+        ]
+    
+    def _can_embed_async(self) -> bool:
+        return self.embed_concurrency > 1 and hasattr(self.embed_model, "aget_text_embedding_batch")
+    
+    async def _aembed_chunks(self, chunks: List[List[str]]) -> List[Any]:
+        """Embed chunks with at most embed_concurrency calls in flight; results keep chunk order"""
+        semaphore = asyncio.Semaphore(self.embed_concurrency)
+        
+        async def embed(chunk: List[str]) -> Any:
+            texts = [self.nodes[nid].embedding_text for nid in chunk]
+            async with semaphore:
+                return await self.embed_model.aget_text_embedding_batch(texts)
+        
+        return await asyncio.gather(*(embed(chunk) for chunk in chunks))
+    
+    def _add_batches(self, chunks: List[List[str]], batches) -> int:
+        count = 0
+        for chunk, vecs in zip(chunks, batches):
+            self._add_vectors(chunk, np.asarray(vecs, dtype=np.float32))
+            count += len(chunk)
+        return count
+    
+    def _add_vectors(self, node_ids: List[str], vecs: np.ndarray) -> None:
+        """Append normalized vectors; a re-embedded node points at its newest row"""
+        self._version += 1
+        vecs /= np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+        if FAISS_AVAILABLE and not self.quantize_embeddings:
+            if self._faiss_index is None:
+                self._faiss_index = faiss.IndexFlatIP(vecs.shape[1])
+            self._faiss_index.add(vecs)
+        else:
+            n = len(self._row_to_id)
+            needed = n + len(vecs)
+            if self._vectors is None or needed > len(self._vectors):
+                capacity = max(needed, 2 * n)
+                dtype = np.int8 if self.quantize_embeddings else np.float32
+                grown = np.empty((capacity, vecs.shape[1]), dtype=dtype)
+                if n:
+                    grown[:n] = self._vectors[:n]
+                self._vectors = grown
+                if self.quantize_embeddings:
+                    scales = np.empty(capacity, dtype=np.float32)
+                    if n:
+                        scales[:n] = self._vector_scales[:n]
+                    self._vector_scales = scales
+            if self.quantize_embeddings:
+                # Symmetric int8: row = round(v / scale), scale = max|v| / 127
+                scales = np.maximum(np.abs(vecs).max(axis=1), 1e-12) / 127
+                self._vectors[n:needed] = np.round(vecs / scales[:, None])
+                self._vector_scales[n:needed] = scales
+            else:
+                self._vectors[n:needed] = vecs
+        for node_id in node_ids:
+            self._id_to_row[node_id] = len(self._row_to_id)
+            self._row_to_id.append(node_id)
+    
+    def _embed_query(self, query: str) -> np.ndarray:
+        """L2-normalized query embedding, shape (1, d), memoized per query text (read-only)"""
+        q = self._query_embeddings.get(query)
+        if q is not None:
+            self._query_embeddings.move_to_end(query)
+            return q
+        q = np.asarray(self.embed_model.get_query_embedding(query), dtype=np.float32)[None, :]
+        q /= max(float(np.linalg.norm(q)), 1e-12)
+        q.setflags(write=False)
+        self._cache_put(self._query_embeddings, query, q, QUERY_EMBED_CACHE_SIZE)
+        return q
+    
+    def warm_query_embeddings(self, queries: List[str]) -> None:
+        """Embed fixed queries ahead of time so their first search skips the model"""
+        if self.embed_model is not None:
+            for query in queries:
+                self._embed_query(query)
+    
+    def _semantic_candidates(
+        self,
+        q: np.ndarray,
+        k: int,
+        rows: Optional[np.ndarray] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Top-k (node_id, cosine similarity) pairs for a normalized query embedding.
+        
+        rows restricts the scan to those matrix rows (NumPy path only).
+        """
+        return self._semantic_candidates_batch(q, k, rows)[0]
+    
+    def _semantic_candidates_batch(
+        self,
+        qs: np.ndarray,
+        k: int,
+        rows: Optional[np.ndarray] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """_semantic_candidates for each row of qs (shape (Q, d)), scored in one matrix product"""
+        if rows is None:
+            k = min(k, len(self._row_to_id))
+        else:
+            k = min(k, len(rows))
+        if k <= 0:
+            return [[] for _ in range(len(qs))]
+        
+        if rows is None and self._faiss_index is not None:
+            sims, top = self._faiss_index.search(qs, k)
+        else:
+            selection = slice(0, len(self._row_to_id)) if rows is None else rows
+            all_sims = self._row_sims(selection, qs)
+            top = np.argpartition(-all_sims, k - 1, axis=1)[:, :k]
+            top_sims = np.take_along_axis(all_sims, top, axis=1)
+            order = np.argsort(-top_sims, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            sims = np.take_along_axis(top_sims, order, axis=1)
+            if rows is not None:
+                top = rows[top]
+        return [self._rows_to_candidates(r, s) for r, s in zip(top, sims)]
+    
+    def _row_sims(self, rows: Any, qs: np.ndarray) -> np.ndarray:
+        """(Q, len(rows)) inner products of queries with matrix rows, de-quantizing int8 rows"""
+        sims = qs @ self._vectors[rows].T
+        if self._vector_scales is not None:
+            sims *= self._vector_scales[rows]
+        return sims
+    
+    def _rows_to_candidates(self, rows: np.ndarray, sims: np.ndarray) -> List[Tuple[str, float]]:
+        candidates = []
+        for row, sim in zip(rows, sims):
+            if row < 0 or sim <= 0:
+                continue
+            node_id = self._row_to_id[row]
+            # Skip rows superseded by a newer embedding of the same node
+            if self._id_to_row.get(node_id) == row:
+                candidates.append((node_id, float(sim)))
+        return candidates
+    
+    def _filtered_rows(
+        self,
+        patient_id: Optional[str],
+        node_types: Optional[List[NodeType]]
+    ) -> Optional[np.ndarray]:
+        """Current embedding rows of nodes passing search()'s filters (None: no filter applies)"""
+        allowed = None
+        if node_types:
+            allowed = set().union(*(self._by_type.get(nt, ()) for nt in node_types))
+        patient_node_id = self.patients.get(patient_id) if patient_id else None
+        if patient_node_id:
+            connected = self._connected_ids(patient_node_id)
+            allowed = connected if allowed is None else allowed & connected
+        if allowed is None:
+            return None
+        id_to_row = self._id_to_row
+        return np.fromiter(
+            (id_to_row[nid] for nid in allowed if nid in id_to_row), dtype=np.int64
+        )
+    
+    def _keyword_candidates(self, query: str) -> List[Tuple[str, float]]:
+        """(node_id, score) pairs: score = len(query tokens & node tokens)"""
+        # Distinct tokens only: repeating a word in the query must not inflate scores.
+        # Counter counts a flat iterable in C, so the posting lists are never
+        # walked by Python bytecode.
+        postings = (self._inverted.get(token, ()) for token in set(_tokenize(query)))
+        scores = Counter(chain.from_iterable(postings))
+        return [(node_id, float(score)) for node_id, score in scores.items()]
     
     def _add_edge(
         self,
@@ -480,13 +1151,33 @@ class PatientGraphRAG:
         data: Optional[Dict[str, Any]] = None
     ) -> None:
         """Add an edge between two nodes"""
+        self._version += 1
+        self._csr = None
+        self._reach_cache.clear()
+        relation_value = RELATION_VALUES[relation]
         self.graph.add_edge(
             source_id,
             target_id,
-            relation=relation.value,
+            relation=relation_value,
             data=data or {},
-            created_at=datetime.now().isoformat()
+            created_at=time.time_ns()  # epoch ns; far cheaper than an ISO string
         )
+        self._bucket_edge(source_id, target_id, relation_value)
+    
+    def _bucket_edge(self, source_id: str, target_id: str, relation: str) -> None:
+        """File the target of a patient's edge under its get_patient_context section"""
+        source = self.nodes.get(source_id)
+        target = self.nodes.get(target_id)
+        if source is None or target is None or source.node_type != NodeType.PATIENT:
+            return
+        section = PATIENT_CONTEXT_SECTIONS.get(target.node_type)
+        if section is None:
+            return
+        if section == "conditions" and (
+            relation == _HAS_ALLERGY or target.data.get("is_allergy")
+        ):
+            section = "allergies"
+        self._patient_buckets[source_id].setdefault(section, {})[target_id] = None
     
     def get_patient_node(self, patient_id: str) -> Optional[PatientNode]:
         """Get the patient node by patient ID"""
@@ -520,84 +1211,95 @@ class PatientGraphRAG:
             "reports": []
         }
         
-        # Get all connected nodes
-        for neighbor_id in self.graph.neighbors(patient_node_id):
-            neighbor_node = self.nodes.get(neighbor_id)
-            if not neighbor_node:
-                continue
-            
-            if neighbor_node.node_type == NodeType.CONDITION:
-                if neighbor_node.data.get("is_allergy"):
-                    context["allergies"].append({
-                        "name": neighbor_node.name,
-                        **neighbor_node.data
-                    })
-                else:
-                    context["conditions"].append({
-                        "name": neighbor_node.name,
-                        **neighbor_node.data
-                    })
-            
-            elif neighbor_node.node_type == NodeType.MEDICATION:
-                context["medications"].append({
-                    "name": neighbor_node.name,
-                    **neighbor_node.data
-                })
-            
-            elif neighbor_node.node_type == NodeType.EVENT:
-                context["recent_events"].append({
-                    "type": neighbor_node.name,
-                    "description": neighbor_node.description,
-                    **neighbor_node.data
-                })
-            
-            elif neighbor_node.node_type == NodeType.CONSULTATION:
-                context["consultations"].append({
-                    "type": neighbor_node.name,
-                    **neighbor_node.data
-                })
-            
-            elif neighbor_node.node_type == NodeType.REPORT:
-                context["reports"].append({
-                    "type": neighbor_node.name,
-                    **neighbor_node.data
-                })
+        # Connected nodes, pre-sorted into context sections by _add_edge
+        for section, node_ids in self._patient_buckets.get(patient_node_id, {}).items():
+            entries = context[section]
+            nodes = [self.nodes[nid] for nid in node_ids if nid in self.nodes]
+            if section == "recent_events":
+                entries.extend(
+                    {"type": n.name, "description": n.description, **n.data} for n in nodes
+                )
+            elif section in ("consultations", "reports"):
+                entries.extend({"type": n.name, **n.data} for n in nodes)
+            else:
+                entries.extend({"name": n.name, **n.data} for n in nodes)
         
         return context
     
+    def _sync_caches(self) -> None:
+        """Drop cached summaries/search results computed on an older graph"""
+        if self._cache_version != self._version:
+            self._summary_cache.clear()
+            self._search_cache.clear()
+            self._query_cache.clear()
+            self._related_cache.clear()
+            self._cache_version = self._version
+    
+    @staticmethod
+    def _cache_put(cache: OrderedDict, key: Any, value: Any, maxsize: int) -> None:
+        cache[key] = value
+        cache.move_to_end(key)
+        if len(cache) > maxsize:
+            cache.popitem(last=False)
+    
     def get_patient_summary(self, patient_id: str) -> str:
         """Generate a text summary of patient history for LLM context"""
-        context = self.get_patient_context(patient_id)
+        self._sync_caches()
+        summary = self._summary_cache.get(patient_id)
+        if summary is None:
+            summary = self._build_patient_summary(patient_id)
+            self._cache_put(self._summary_cache, patient_id, summary, SUMMARY_CACHE_SIZE)
+        else:
+            self._summary_cache.move_to_end(patient_id)
+        return summary
+    
+    def _build_patient_summary(self, patient_id: str) -> str:
+        # Same text as formatting get_patient_context(), read straight off the
+        # section buckets so no per-neighbour context dicts are built
+        patient_node_id = self.patients.get(patient_id)
+        patient_node = self.nodes.get(patient_node_id) if patient_node_id else None
         
-        if not context:
+        if not patient_node:
             return f"Aucune information disponible pour le patient {patient_id}"
         
+        data = patient_node.data
         summary_parts = [
-            f"=== Résumé Patient: {context.get('name', 'N/A')} ===",
+            f"=== Résumé Patient: {data.get('name', patient_node.name)} ===",
             f"ID: {patient_id}",
-            f"Âge: {context.get('age', 'N/A')} ans",
-            f"Chambre: {context.get('room', 'N/A')}"
+            f"Âge: {data.get('age', 'N/A')} ans",
+            f"Chambre: {data.get('room', 'N/A')}"
         ]
         
-        if context.get("conditions"):
-            conditions = [c["name"] for c in context["conditions"]]
-            summary_parts.append(f"\nConditions: {', '.join(conditions)}")
+        buckets = self._patient_buckets.get(patient_node_id, {})
+        
+        def section_nodes(section: str) -> List[PatientNode]:
+            return [self.nodes[nid] for nid in buckets.get(section, ()) if nid in self.nodes]
+        
+        def names(section: str) -> str:
+            return ", ".join(n.data.get("name", n.name) for n in section_nodes(section))
         
-        if context.get("allergies"):
-            allergies = [a["name"] for a in context["allergies"]]
-            summary_parts.append(f"Allergies: {', '.join(allergies)}")
+        conditions = names("conditions")
+        if conditions:
+            summary_parts.append(f"\nConditions: {conditions}")
+        
+        allergies = names("allergies")
+        if allergies:
+            summary_parts.append(f"Allergies: {allergies}")
         
-        if context.get("medications"):
-            meds = [m["name"] for m in context["medications"]]
-            summary_parts.append(f"Traitements: {', '.join(meds)}")
+        meds = names("medications")
+        if meds:
+            summary_parts.append(f"Traitements: {meds}")
         
-        if context.get("risk_factors"):
-            summary_parts.append(f"Facteurs de risque: {', '.join(context['risk_factors'])}")
+        if data.get("risk_factors"):
+            summary_parts.append(f"Facteurs de risque: {', '.join(data['risk_factors'])}")
         
-        if context.get("recent_events"):
-            summary_parts.append(f"\nÉvénements récents: {len(context['recent_events'])}")
-            for event in context["recent_events"][:5]:  # Last 5
-                summary_parts.append(f"  - {event['type']}: {event['description']}")
+        events = section_nodes("recent_events")
+        if events:
+            summary_parts.append(f"\nÉvénements récents: {len(events)}")
+            for event in events[:5]:
+                summary_parts.append(
+                    f"  - {event.data.get('type', event.name)}: {event.data.get('description', event.description)}"
+                )
         
         return "\n".join(summary_parts)
     
@@ -613,6 +1315,9 @@ class PatientGraphRAG:
         """
         Search the knowledge graph using semantic similarity.
         
+        With an embedding model, nodes are ranked by cosine similarity to the
+        query; otherwise by the number of query words they contain.
+        
         Args:
             query: Search query
             patient_id: Optional filter by patient
@@ -622,51 +1327,179 @@ class PatientGraphRAG:
         Returns:
             List of matching nodes with relevance scores
         """
-        results = []
-        
-        # Simple keyword matching (fallback without embeddings)
-        query_lower = query.lower()
+        return self.search_batch([query], [patient_id], node_types, limit)[0]
+    
+    def search_batch(
+        self,
+        queries: List[str],
+        patient_ids: Optional[List[Optional[str]]] = None,
+        node_types: Optional[List[NodeType]] = None,
+        limit: int = 10
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        search() for several queries; patient_ids[i] filters queries[i].
         
-        for node_id, node in self.nodes.items():
-            # Filter by patient if specified
-            if patient_id and patient_id in self.patients:
-                patient_node_id = self.patients[patient_id]
-                if not self._is_connected(patient_node_id, node_id):
+        With embeddings, all queries sharing a patient filter are scored
+        against the node vectors in a single matrix product.
+        """
+        if patient_ids is None:
+            patient_ids = [None] * len(queries)
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(queries)
+        
+        self.flush_embeddings()
+        self._sync_caches()
+        type_key = tuple(node_types) if node_types else None
+        
+        if not self._row_to_id:
+            # Keyword matching (fallback without embeddings)
+            for i, (query, patient_id) in enumerate(zip(queries, patient_ids)):
+                cache_key = (query, (patient_id, type_key, limit))
+                cached = self._search_cache.get(cache_key)
+                if cached is not None:
+                    self._search_cache.move_to_end(cache_key)
+                    results[i] = list(cached)
                     continue
+                ranked = self._rank_candidates(self._keyword_candidates(query), patient_id, node_types, limit)
+                self._cache_put(self._search_cache, cache_key, ranked, SEARCH_CACHE_SIZE)
+                results[i] = list(ranked)
+            return results
+        
+        # A near-identical earlier query (cosine >= threshold) reuses its results
+        pending: Dict[Optional[str], List[Tuple[int, np.ndarray]]] = defaultdict(list)
+        for i, (query, patient_id) in enumerate(zip(queries, patient_ids)):
+            q = self._embed_query(query)
+            cached = self._lookup_query_cache(q, (patient_id, type_key, limit))
+            if cached is not None:
+                results[i] = list(cached)
+            else:
+                pending[patient_id].append((i, q[0]))
+        
+        for patient_id, items in pending.items():
+            qs = np.stack([q for _, q in items])
+            rows = None
+            if self._faiss_index is None and (patient_id or node_types):
+                rows = self._filtered_rows(patient_id, node_types)
+            if rows is not None:
+                # Only rows passing the filters are scored, so no over-fetch is needed
+                batch = self._semantic_candidates_batch(qs, limit, rows)
+            else:
+                # Over-fetch so filtering by type/patient still leaves enough hits
+                batch = self._semantic_candidates_batch(qs, limit * 4)
             
+            filters = (patient_id, type_key, limit)
+            for (i, q), candidates in zip(items, batch):
+                ranked = self._rank_candidates(candidates, patient_id, node_types, limit)
+                self._query_cache_seq += 1
+                self._cache_put(self._query_cache, self._query_cache_seq, (q, filters, ranked), SEARCH_CACHE_SIZE)
+                results[i] = list(ranked)
+        return results
+    
+    def lexical_search(
+        self,
+        query: str,
+        patient_id: Optional[str] = None,
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        Rank nodes by Okapi BM25 over their name and description.
+        
+        Complements search(): exact clinical terms score here even when
+        an embedding model places them far from the query.
+        
+        Returns:
+            Results in the same format as search()
+        """
+        n_docs = len(self._bm25_lengths)
+        if not n_docs:
+            return []
+        avg_length = max(self._bm25_total_length / n_docs, 1e-9)
+        
+        scores: Dict[str, float] = defaultdict(float)
+        for token in set(_tokenize(query)):
+            postings = self._bm25_postings.get(token)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for node_id, tf in postings.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._bm25_lengths[node_id] / avg_length)
+                scores[node_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        
+        return self._rank_candidates(list(scores.items()), patient_id, None, limit)
+    
+    def _rank_candidates(
+        self,
+        candidates: List[Tuple[str, float]],
+        patient_id: Optional[str],
+        node_types: Optional[List[NodeType]],
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """Filter (node_id, score) candidates and build the top search() results"""
+        results = []
+        
+        allowed_ids = None
+        if node_types:
+            allowed_ids = set().union(*(self._by_type.get(nt, ()) for nt in node_types))
+        patient_node_id = self.patients.get(patient_id) if patient_id else None
+        
+        for node_id, score in candidates:
             # Filter by node type
-            if node_types and node.node_type not in node_types:
+            if allowed_ids is not None and node_id not in allowed_ids:
                 continue
             
-            # Calculate simple relevance score
-            text = node.embedding_text.lower()
-            score = 0.0
-            
-            for word in query_lower.split():
-                if word in text:
-                    score += 1.0
+            # Filter by patient if specified
+            if patient_node_id and not self._is_connected(patient_node_id, node_id):
+                continue
             
-            if score > 0:
-                results.append({
-                    "node_id": node_id,
-                    "node": node.model_dump(),
-                    "score": score,
-                    "type": node.node_type.value
-                })
-        
-        # Sort by score and limit
-        results.sort(key=lambda x: x["score"], reverse=True)
+            node = self.nodes[node_id]
+            results.append({
+                "node_id": node_id,
+                "node": self._node_dump(node_id),
+                "score": score,
+                "type": NODE_TYPE_VALUES[node.node_type]
+            })
+        
+        # Sort by score (ties keep insertion order) and limit
+        results.sort(key=lambda x: (-x["score"], self._node_seq[x["node_id"]]))
         return results[:limit]
     
+    def _lookup_query_cache(self, q: np.ndarray, filters: Tuple) -> Optional[List[Dict[str, Any]]]:
+        """Results of the most similar cached query with the same filters, if similar enough"""
+        if not self._query_cache:
+            return None
+        keys = list(self._query_cache)
+        sims = np.stack([entry[0] for entry in self._query_cache.values()]) @ q[0]
+        for idx in np.argsort(-sims):
+            if sims[idx] < SEMANTIC_CACHE_THRESHOLD:
+                break
+            key = keys[idx]
+            _, cached_filters, results = self._query_cache[key]
+            if cached_filters == filters:
+                self._query_cache.move_to_end(key)
+                return results
+        return None
+    
+    def _adjacency(self) -> _AdjacencyCSR:
+        """CSR snapshot of the current edges"""
+        if self._csr is None:
+            self._csr = _AdjacencyCSR(self.graph)
+        return self._csr
+    
+    def _connected_ids(self, node_id: str) -> Set[str]:
+        """Ids of nodes with a directed path to or from node_id (itself included)"""
+        reach = self._reach_cache.get(node_id)
+        if reach is None:
+            reach = {node_id}
+            if node_id in self.graph:
+                reach |= nx.descendants(self.graph, node_id)
+                reach |= nx.ancestors(self.graph, node_id)
+            self._reach_cache[node_id] = reach
+        return reach
+    
     def _is_connected(self, source_id: str, target_id: str) -> bool:
         """Check if two nodes are connected (directly or indirectly)"""
-        if source_id == target_id:
-            return True
-        try:
-            return nx.has_path(self.graph, source_id, target_id) or \
-                   nx.has_path(self.graph, target_id, source_id)
-        except nx.NetworkXError:
-            return False
+        # Two traversals per source node, then a set lookup per target
+        return target_id in self._connected_ids(source_id)
     
     def get_related_nodes(
         self,
@@ -675,39 +1508,51 @@ class PatientGraphRAG:
         max_depth: int = 2
     ) -> List[PatientNode]:
         """Get nodes related to a given node"""
+        self._sync_caches()
+        cache_key = (node_id, tuple(relation_types) if relation_types else None, max_depth)
+        related = self._related_cache.get(cache_key)
+        if related is None:
+            related = tuple(self._find_related_nodes(node_id, relation_types, max_depth))
+            self._cache_put(self._related_cache, cache_key, related, RELATED_CACHE_SIZE)
+        else:
+            self._related_cache.move_to_end(cache_key)
+        return list(related)
+    
+    def _find_related_nodes(
+        self,
+        node_id: str,
+        relation_types: Optional[List[RelationType]],
+        max_depth: int
+    ) -> List[PatientNode]:
         related = []
         
         if node_id not in self.graph:
             return related
         
-        # BFS traversal
-        visited = set()
-        queue = [(node_id, 0)]
-        
-        while queue:
-            current_id, depth = queue.pop(0)
-            
-            if current_id in visited or depth > max_depth:
-                continue
-            
-            visited.add(current_id)
-            
-            if current_id != node_id and current_id in self.nodes:
-                related.append(self.nodes[current_id])
-            
-            # Get neighbors
-            for neighbor_id in self.graph.neighbors(current_id):
-                if neighbor_id not in visited:
-                    # Check relation type filter
-                    if relation_types:
-                        edge_data = self.graph.get_edge_data(current_id, neighbor_id)
-                        if edge_data:
-                            for key, data in edge_data.items():
-                                if data.get("relation") in [r.value for r in relation_types]:
-                                    queue.append((neighbor_id, depth + 1))
-                                    break
-                    else:
-                        queue.append((neighbor_id, depth + 1))
+        # Level-by-level BFS over the CSR snapshot: each level is a handful of
+        # array ops instead of per-edge dict lookups
+        adjacency = self._adjacency()
+        allowed = None
+        if relation_types:
+            allowed = np.array([RELATION_CODES[r] for r in relation_types], dtype=np.int8)
+        visited = np.zeros(len(adjacency.ids), dtype=bool)
+        frontier = np.array([adjacency.row[node_id]], dtype=np.int64)
+        visited[frontier] = True
+        
+        for _ in range(max_depth):
+            targets, relations = adjacency.out_edges(frontier)
+            if allowed is not None:
+                targets = targets[np.isin(relations, allowed)]
+            # First occurrence order = discovery order of the queue-based BFS
+            _, first = np.unique(targets, return_index=True)
+            targets = targets[np.sort(first)]
+            frontier = targets[~visited[targets]]
+            if len(frontier) == 0:
+                break
+            visited[frontier] = True
+            related.extend(
+                self.nodes[nid] for nid in (adjacency.ids[i] for i in frontier) if nid in self.nodes
+            )
         
         return related
     
@@ -719,14 +1564,14 @@ class PatientGraphRAG:
         if not path:
             return
         
-        data = {
-            "nodes": {nid: node.model_dump() for nid, node in self.nodes.items()},
-            "edges": list(self.graph.edges(data=True)),
-            "patients": self.patients
-        }
-        
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, default=str)
+        # One JSON document per line (header, nodes, edges), written as it is
+        # produced instead of building the whole graph as one dict first
+        with open(path, "wb") as f:
+            f.write(_json_line({"version": GRAPH_FILE_VERSION, "patients": self.patients}))
+            for nid, node in self.nodes.items():
+                f.write(_json_line({"n": nid, "d": {**node.to_dict(), "node_type": NODE_TYPE_VALUES[node.node_type]}}))
+            for source, target, edge_data in self.graph.edges(data=True):
+                f.write(_json_line({"e": [source, target, edge_data]}))
     
     def load(self, filepath: Optional[str] = None) -> None:
         """Load the graph from disk"""
@@ -735,24 +1580,57 @@ class PatientGraphRAG:
             return
         
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            
-            # Restore nodes
-            for nid, node_data in data.get("nodes", {}).items():
-                node = PatientNode(**node_data)
-                self.nodes[nid] = node
-                self.graph.add_node(nid, **node_data)
-            
-            # Restore edges
-            for source, target, edge_data in data.get("edges", []):
-                self.graph.add_edge(source, target, **edge_data)
-            
-            # Restore patient registry
-            self.patients = data.get("patients", {})
-            
+            f = open(path, "rb")
         except FileNotFoundError:
-            pass
+            return
+        
+        with f:
+            first_line = f.readline()
+            try:
+                header = _json_loads(first_line)
+            except ValueError:
+                header = None
+            
+            if isinstance(header, dict) and "version" in header:
+                # Line-delimited format written by save()
+                self.patients = header.get("patients", {})
+                edges = []
+                for line in f:
+                    record = _json_loads(line)
+                    if "n" in record:
+                        self._restore_node(record["n"], record["d"])
+                    else:
+                        edges.append(record["e"])
+            else:
+                # Older single-document format, whose node IDs used truncated MD5
+                data = _json_loads(first_line + f.read())
+                nodes = data.get("nodes", {})
+                edges = data.get("edges", [])
+                patients = data.get("patients", {})
+                id_map = _migrate_legacy_ids(nodes, edges, patients)
+                for nid, node_data in nodes.items():
+                    nid = id_map.get(nid, nid)
+                    self._restore_node(nid, {**node_data, "id": nid})
+                edges = [
+                    (id_map.get(source, source), id_map.get(target, target), edge_data)
+                    for source, target, edge_data in edges
+                ]
+                self.patients = {pid: id_map.get(nid, nid) for pid, nid in patients.items()}
+        
+        # Restore edges
+        self._csr = None
+        self._reach_cache.clear()
+        for source, target, edge_data in edges:
+            self.graph.add_edge(source, target, **edge_data)
+            self._bucket_edge(source, target, edge_data.get("relation", ""))
+        
+        self._version += 1
+    
+    def _restore_node(self, nid: str, node_data: Dict[str, Any]) -> None:
+        """Register a node read back from disk"""
+        node = PatientNode.from_dict(node_data)
+        self._register_node(node)
+        self.graph.add_node(nid, type=NODE_TYPE_VALUES[node.node_type], name=node.name)
     
     def get_statistics(self) -> Dict[str, Any]:
         """Get graph statistics"""
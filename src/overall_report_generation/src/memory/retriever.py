@@ -3,13 +3,29 @@ Graph Retriever - Semantic and graph-based retrieval for patient context
 Combines vector search with graph traversal for comprehensive retrieval
 """
 
+from collections import defaultdict
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Dict, Any, List, Optional, Tuple
-from pydantic import BaseModel, Field
+import time
 from enum import Enum
+from itertools import groupby
 
 from .patient_graph import PatientGraphRAG, PatientNode, NodeType, RelationType
 
+# Rank offset of Reciprocal Rank Fusion: score = sum(1 / (RRF_K + rank))
+RRF_K = 60
+
+# Fixed queries of the night / consultation helpers
+NIGHT_QUERY = "surveillance nocturne alertes risques"
+SPECIALTY_QUERIES = {
+    "cardio": "cardiaque coeur rythme tension ECG",
+    "dermato": "peau lésion cutané éruption",
+    "ophtalmo": "oeil vision rétine fond",
+    "pneumo": "poumon respiration toux saturation",
+    "general": "symptômes antécédents traitements"
+}
+
 
 class RetrievalMode(str, Enum):
     """Modes for context retrieval"""
@@ -19,20 +35,21 @@ class RetrievalMode(str, Enum):
     TEMPORAL = "temporal"        # Time-based retrieval
 
 
-class RetrievalResult(BaseModel):
+@dataclass(slots=True)
+class RetrievalResult:
     """Result from a retrieval query"""
     query: str
     mode: RetrievalMode
     patient_id: Optional[str] = None
     
     # Results
-    nodes: List[Dict[str, Any]] = Field(default_factory=list)
-    context_text: str = Field(default="")
+    nodes: List[Dict[str, Any]] = field(default_factory=list)
+    context_text: str = ""
     
     # Metadata
-    total_results: int = Field(default=0)
-    retrieval_time_ms: float = Field(default=0.0)
-    timestamp: datetime = Field(default_factory=datetime.now)
+    total_results: int = 0
+    retrieval_time_ms: float = 0.0
+    timestamp: datetime = field(default_factory=datetime.now)
     
     def get_context_for_llm(self) -> str:
         """Format context for LLM consumption"""
@@ -72,6 +89,8 @@ class GraphRetriever:
             graph_rag: The PatientGraphRAG instance to query
         """
         self.graph = graph_rag
+        # The helper queries never change: embed them once, up front
+        self.graph.warm_query_embeddings([NIGHT_QUERY, *SPECIALTY_QUERIES.values()])
     
     def retrieve(
         self,
@@ -96,8 +115,63 @@ class GraphRetriever:
         Returns:
             RetrievalResult with matching context
         """
-        start_time = datetime.now()
+        return self._retrieve(
+            query, patient_id, mode, max_results,
+            include_relationships, time_window_days, time.perf_counter_ns()
+        )
+    
+    def retrieve_batch(
+        self,
+        queries: List[str],
+        patient_ids: Optional[List[Optional[str]]] = None,
+        mode: RetrievalMode = RetrievalMode.HYBRID,
+        max_results: int = 10,
+        include_relationships: bool = True,
+        time_window_days: Optional[int] = None
+    ) -> List[RetrievalResult]:
+        """
+        Retrieve context for several queries at once.
+        
+        The semantic part of every query is answered by one batched search;
+        graph, temporal and relationship retrieval run per query as in retrieve().
+        
+        Args:
+            queries: Search queries
+            patient_ids: Patient filter per query (optional)
+            mode, max_results, include_relationships, time_window_days: As in retrieve()
+            
+        Returns:
+            One RetrievalResult per query, in order
+        """
+        start_ns = time.perf_counter_ns()
+        if patient_ids is None:
+            patient_ids = [None] * len(queries)
+        
+        semantic_nodes: List[Optional[List[Dict[str, Any]]]] = [None] * len(queries)
+        if mode in (RetrievalMode.SEMANTIC, RetrievalMode.HYBRID):
+            limit = max_results if mode == RetrievalMode.SEMANTIC else max_results // 2
+            batch = self.graph.search_batch(queries, patient_ids, limit=limit)
+            semantic_nodes = [self._semantic_nodes(results) for results in batch]
         
+        return [
+            self._retrieve(
+                query, patient_id, mode, max_results,
+                include_relationships, time_window_days, start_ns, semantic
+            )
+            for query, patient_id, semantic in zip(queries, patient_ids, semantic_nodes)
+        ]
+    
+    def _retrieve(
+        self,
+        query: str,
+        patient_id: Optional[str],
+        mode: RetrievalMode,
+        max_results: int,
+        include_relationships: bool,
+        time_window_days: Optional[int],
+        start_ns: int,
+        semantic_nodes: Optional[List[Dict[str, Any]]] = None
+    ) -> RetrievalResult:
         result = RetrievalResult(
             query=query,
             mode=mode,
@@ -105,7 +179,9 @@ class GraphRetriever:
         )
         
         if mode == RetrievalMode.SEMANTIC:
-            nodes = self._semantic_retrieval(query, patient_id, max_results)
+            if semantic_nodes is None:
+                semantic_nodes = self._semantic_retrieval(query, patient_id, max_results)
+            nodes = semantic_nodes
         elif mode == RetrievalMode.GRAPH:
             nodes = self._graph_retrieval(query, patient_id, max_results)
         elif mode == RetrievalMode.TEMPORAL:
@@ -113,13 +189,14 @@ class GraphRetriever:
         else:  # HYBRID
             nodes = self._hybrid_retrieval(
                 query, patient_id, max_results, 
-                time_window_days, include_relationships
+                time_window_days, include_relationships,
+                semantic_nodes
             )
         
         result.nodes = nodes
         result.total_results = len(nodes)
         result.context_text = self._format_context(nodes, patient_id)
-        result.retrieval_time_ms = (datetime.now() - start_time).total_seconds() * 1000
+        result.retrieval_time_ms = (time.perf_counter_ns() - start_ns) / 1e6
         
         return result
     
@@ -135,7 +212,11 @@ class GraphRetriever:
             patient_id=patient_id,
             limit=max_results
         )
-        
+        return self._semantic_nodes(search_results)
+    
+    @staticmethod
+    def _semantic_nodes(search_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Convert PatientGraphRAG.search results to retrieval nodes"""
         return [
             {
                 "id": r["node_id"],
@@ -201,34 +282,18 @@ class GraphRetriever:
         nodes = []
         cutoff = datetime.now().timestamp() - (days * 24 * 60 * 60)
         
-        for node_id, node in self.graph.nodes.items():
-            # Filter by patient if specified
-            if patient_id:
-                patient_node_id = self.graph.patients.get(patient_id)
-                if patient_node_id and not self.graph._is_connected(patient_node_id, node_id):
-                    continue
-            
-            # Check timestamp
-            timestamp_str = node.data.get("timestamp")
-            if timestamp_str:
-                try:
-                    node_time = datetime.fromisoformat(timestamp_str).timestamp()
-                    if node_time >= cutoff:
-                        nodes.append({
-                            "id": node_id,
-                            "type": node.node_type.value,
-                            "name": node.name,
-                            "description": node.description,
-                            "timestamp": timestamp_str,
-                            "data": node.data
-                        })
-                except (ValueError, TypeError):
-                    pass
-        
-        # Sort by timestamp (most recent first)
-        nodes.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-        
-        return nodes[:max_results]
+        # The graph keeps timestamped nodes sorted and a reachability mask per patient
+        for node in self.graph.recent_nodes(cutoff, patient_id, max_results):
+            nodes.append({
+                "id": node.id,
+                "type": node.node_type.value,
+                "name": node.name,
+                "description": node.description,
+                "timestamp": node.data["timestamp"],
+                "data": node.data
+            })
+        
+        return nodes
     
     def _hybrid_retrieval(
         self,
@@ -236,18 +301,26 @@ class GraphRetriever:
         patient_id: Optional[str],
         max_results: int,
         time_window_days: Optional[int],
-        include_relationships: bool
+        include_relationships: bool,
+        semantic_results: Optional[List[Dict[str, Any]]] = None
     ) -> List[Dict[str, Any]]:
         """Combined retrieval approach"""
         all_nodes = []
         seen_ids = set()
         
-        # 1. Semantic search (40% of results)
-        semantic_results = self._semantic_retrieval(query, patient_id, max_results // 2)
-        for node in semantic_results:
+        # 1. Semantic + BM25 search, fused by reciprocal rank (40% of results)
+        if semantic_results is None:
+            semantic_results = self._semantic_retrieval(query, patient_id, max_results // 2)
+        lexical_results = self._semantic_nodes(
+            self.graph.lexical_search(query, patient_id=patient_id, limit=max_results // 2)
+        )
+        fused = self._reciprocal_rank_fusion(
+            [("semantic", semantic_results), ("lexical", lexical_results)]
+        )
+        for source, node in fused[:max_results // 2]:
             node_id = node.get("id", node.get("name"))
             if node_id not in seen_ids:
-                node["source"] = "semantic"
+                node["source"] = source
                 all_nodes.append(node)
                 seen_ids.add(node_id)
         
@@ -290,6 +363,28 @@ class GraphRetriever:
         
         return all_nodes[:max_results]
     
+    @staticmethod
+    def _reciprocal_rank_fusion(
+        rankings: List[Tuple[str, List[Dict[str, Any]]]]
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Merge ranked node lists by Reciprocal Rank Fusion.
+        
+        Returns (source, node) pairs by descending fused score; a node found by
+        several rankings keeps the entry (and source) of the first one.
+        """
+        fused: Dict[Any, List] = {}
+        for source, nodes in rankings:
+            for rank, node in enumerate(nodes, 1):
+                node_id = node.get("id", node.get("name"))
+                entry = fused.get(node_id)
+                if entry is None:
+                    fused[node_id] = [1 / (RRF_K + rank), source, node]
+                else:
+                    entry[0] += 1 / (RRF_K + rank)
+        ranked = sorted(fused.values(), key=lambda entry: -entry[0])
+        return [(source, node) for _, source, node in ranked]
+    
     def _format_context(
         self,
         nodes: List[Dict[str, Any]],
@@ -305,39 +400,37 @@ class GraphRetriever:
                 parts.append(summary)
                 parts.append("\n--- Informations Contextuelles ---\n")
         
-        # Group by type
-        conditions = [n for n in nodes if n.get("type") == "condition"]
-        medications = [n for n in nodes if n.get("type") == "medication"]
-        events = [n for n in nodes if n.get("type") == "event"]
-        others = [n for n in nodes if n.get("type") not in ["condition", "medication", "event"]]
+        # Group by type in one pass
+        by_type: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for n in nodes:
+            node_type = n.get("type")
+            by_type[node_type if node_type in ("condition", "medication", "event") else "other"].append(n)
         
-        if conditions:
+        if by_type["condition"]:
             parts.append("**Conditions:**")
-            for c in conditions:
-                parts.append(f"- {c['name']}: {c.get('description', '')}")
+            parts.extend(f"- {c['name']}: {c.get('description', '')}" for c in by_type["condition"])
         
-        if medications:
+        if by_type["medication"]:
             parts.append("\n**Traitements:**")
-            for m in medications:
-                parts.append(f"- {m['name']}")
+            parts.extend(f"- {m['name']}" for m in by_type["medication"])
         
-        if events:
+        if by_type["event"]:
             parts.append("\n**Événements Récents:**")
-            for e in events:
-                ts = e.get("data", {}).get("timestamp", "")
-                parts.append(f"- [{ts}] {e['name']}: {e.get('description', '')}")
+            parts.extend(
+                f"- [{e.get('data', {}).get('timestamp', '')}] {e['name']}: {e.get('description', '')}"
+                for e in by_type["event"]
+            )
         
-        if others:
+        if by_type["other"]:
             parts.append("\n**Autres Informations:**")
-            for o in others:
-                parts.append(f"- [{o.get('type')}] {o['name']}")
+            parts.extend(f"- [{o.get('type')}] {o['name']}" for o in by_type["other"])
         
         return "\n".join(parts)
     
     def get_patient_context_for_night(self, patient_id: str) -> str:
         """Get context specifically for night surveillance"""
         result = self.retrieve(
-            query="surveillance nocturne alertes risques",
+            query=NIGHT_QUERY,
             patient_id=patient_id,
             mode=RetrievalMode.HYBRID,
             max_results=15,
@@ -362,16 +455,8 @@ class GraphRetriever:
         specialty: str = "general"
     ) -> str:
         """Get context for day consultation based on specialty"""
-        # Build specialty-specific query
-        specialty_keywords = {
-            "cardio": "cardiaque coeur rythme tension ECG",
-            "dermato": "peau lésion cutané éruption",
-            "ophtalmo": "oeil vision rétine fond",
-            "pneumo": "poumon respiration toux saturation",
-            "general": "symptômes antécédents traitements"
-        }
-        
-        query = specialty_keywords.get(specialty, specialty_keywords["general"])
+        # Specialty-specific query
+        query = SPECIALTY_QUERIES.get(specialty, SPECIALTY_QUERIES["general"])
         
         result = self.retrieve(
             query=query,
@@ -400,19 +485,16 @@ class GraphRetriever:
         # Build timeline
         timeline_parts = [f"=== Analyse Longitudinale ({days} jours) ===\n"]
         
-        # Group events by day
-        events_by_day: Dict[str, List[Dict]] = {}
-        for node in result.nodes:
-            ts = node.get("data", {}).get("timestamp", "")
-            if ts:
-                day = ts[:10]  # YYYY-MM-DD
-                if day not in events_by_day:
-                    events_by_day[day] = []
-                events_by_day[day].append(node)
+        # Group events by day (YYYY-MM-DD). Temporal results are already newest
+        # first, so this stable sort is a single pass that keeps in-day order.
+        def day_of(node: Dict[str, Any]) -> str:
+            return node.get("data", {}).get("timestamp", "")[:10]
+        
+        dated = sorted((node for node in result.nodes if day_of(node)), key=day_of, reverse=True)
         
         # Format timeline
-        for day in sorted(events_by_day.keys(), reverse=True):
-            events = events_by_day[day]
+        for day, group in groupby(dated, key=day_of):
+            events = list(group)
             timeline_parts.append(f"\n📅 {day} ({len(events)} événements)")
             for event in events:
                 timeline_parts.append(f"  • {event['name']}: {event.get('description', '')}")
@@ -8,22 +8,64 @@ import os
 from datetime import datetime
 from pathlib import Path
 
+# Optional: faster JSON parsing and serialization
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+NIGHT_LOG_FILE = "night_log.jsonl"
+LEGACY_NIGHT_LOG_FILE = "night_log.json"  # whole-list JSON, read if no .jsonl exists
+
 
 def safe_load_json(path):
     """Safely load JSON with fallback to empty list."""
     try:
+        if ORJSON_AVAILABLE:
+            with open(path, "rb") as f:
+                return orjson.loads(f.read())
         with open(path, "r") as f:
             return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
+    except (ValueError, FileNotFoundError):
         return []
 
 
+def _dump_line(entry):
+    """One JSON document as a newline-terminated UTF-8 line."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def load_jsonl(path):
+    """Load a JSON-lines file; blank or truncated lines are skipped."""
+    entries = []
+    try:
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entries.append(orjson.loads(line) if ORJSON_AVAILABLE else json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return entries
+
+
 def safe_write_json(path, data):
     """Safely write JSON with automatic directory creation."""
     try:
         os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "w") as f:
-            json.dump(data, f, indent=2)
+        if ORJSON_AVAILABLE:
+            payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+            with open(path, "wb") as f:
+                f.write(payload)
+        else:
+            with open(path, "w") as f:
+                json.dump(data, f, indent=2)
         return True
     except IOError as e:
         print(f"Warning: Failed to save {path}: {e}")
@@ -39,6 +81,9 @@ class LocalStorage:
     def __init__(self, base_path="data/patients"):
         self.base_path = base_path
         os.makedirs(base_path, exist_ok=True)
+        # patient_id -> (night log size in bytes, events); the size detects
+        # lines appended by another LocalStorage instance or process
+        self._night_cache = {}
 
     def _get_patient_folder(self, patient_id):
         """Get or create patient folder."""
@@ -58,9 +103,6 @@ class LocalStorage:
         Returns:
             int: Total number of events logged for this patient tonight
         """
-        folder = self._get_patient_folder(patient_id)
-        file_path = os.path.join(folder, "night_log.json")
-
         # Structure the event entry
         entry = {
             "timestamp": datetime.now().isoformat(),
@@ -70,16 +112,53 @@ class LocalStorage:
             "status": "UNRESOLVED"
         }
 
-        # Load existing history
-        history = safe_load_json(file_path)
+        # Load existing history (cached after the first call)
+        history = self._load_night_log(patient_id)
+        file_path = self._night_log_path(patient_id)
+
+        # Append one line instead of rewriting the whole history, and fsync it:
+        # the event counts as saved once this returns
+        try:
+            with open(file_path, "ab") as f:
+                f.write(_dump_line(entry))
+                f.flush()
+                os.fsync(f.fileno())
+        except IOError as e:
+            print(f"Warning: Failed to save {file_path}: {e}")
+            return -1
 
-        # Append new event
         history.append(entry)
-
-        # Write back
-        if safe_write_json(file_path, history):
-            return len(history)
-        return -1
+        self._night_cache[patient_id] = (os.path.getsize(file_path), history)
+        return len(history)
+
+    def _night_log_path(self, patient_id):
+        return os.path.join(self._get_patient_folder(patient_id), NIGHT_LOG_FILE)
+
+    def _load_night_log(self, patient_id):
+        """Cached event list of a patient's night log (do not mutate)."""
+        file_path = self._night_log_path(patient_id)
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            size = None
+
+        cached = self._night_cache.get(patient_id)
+        if cached is not None and cached[0] == size:
+            return cached[1]
+
+        if size is None:
+            # Night logs written before the JSONL format are converted once
+            legacy_path = os.path.join(os.path.dirname(file_path), LEGACY_NIGHT_LOG_FILE)
+            events = safe_load_json(legacy_path) if os.path.exists(legacy_path) else []
+            if events:
+                with open(file_path, "wb") as f:
+                    f.write(b"".join(_dump_line(e) for e in events))
+                size = os.path.getsize(file_path)
+        else:
+            events = load_jsonl(file_path)
+
+        self._night_cache[patient_id] = (size, events)
+        return events
 
     def get_night_events(self, patient_id):
         """
@@ -90,11 +169,9 @@ class LocalStorage:
             patient_id: Patient identifier
             
         Returns:
-            list: All events from night_log.json or empty list
+            list: All events from night_log.jsonl or empty list
         """
-        folder = self._get_patient_folder(patient_id)
-        file_path = os.path.join(folder, "night_log.json")
-        return safe_load_json(file_path)
+        return list(self._load_night_log(patient_id))
 
     def get_night_summary(self, patient_id):
         """
@@ -106,7 +183,7 @@ class LocalStorage:
         Returns:
             dict: Last event or None
         """
-        events = self.get_night_events(patient_id)
+        events = self._load_night_log(patient_id)
         return events[-1] if events else None
 
     def save_patient_profile(self, patient_id, profile_data):
@@ -150,7 +227,14 @@ class LocalStorage:
             bool: Success status
         """
         folder = self._get_patient_folder(patient_id)
-        file_path = os.path.join(folder, "night_log.json")
-        if os.path.exists(file_path):
-            return safe_write_json(file_path, [])
+        file_path = os.path.join(folder, NIGHT_LOG_FILE)
+        legacy_path = os.path.join(folder, LEGACY_NIGHT_LOG_FILE)
+        self._night_cache.pop(patient_id, None)
+        if os.path.exists(file_path) or os.path.exists(legacy_path):
+            # An empty .jsonl also shadows any legacy night_log.json
+            try:
+                open(file_path, "wb").close()
+            except IOError as e:
+                print(f"Warning: Failed to save {file_path}: {e}")
+                return False
         return True
@@ -55,6 +55,27 @@ class TestRelationType:
         assert "has_allergy" in types
 
 
+class BagOfWordsEmbedding:
+    """Deterministic stand-in embedding model: hashed word counts"""
+    
+    def __init__(self):
+        self.batch_calls = 0
+    
+    def _embed(self, text):
+        import numpy as np
+        vec = np.zeros(256, dtype=np.float32)
+        for word in text.lower().split():
+            vec[sum(map(ord, word)) % 256] += 1
+        return vec
+    
+    def get_text_embedding_batch(self, texts):
+        self.batch_calls += 1
+        return [self._embed(t) for t in texts]
+    
+    def get_query_embedding(self, query):
+        return self._embed(query)
+
+
 class TestPatientGraphRAG:
     """Test PatientGraphRAG class"""
     
@@ -159,6 +180,146 @@ class TestPatientGraphRAG:
         assert "total_edges" in stats
         assert "total_patients" in stats
         assert stats["total_patients"] == 1
+    
+    @pytest.mark.skipif(not GRAPH_RAG_AVAILABLE, reason="GraphRAG not available")
+    def test_search_with_embed_model(self, sample_patient_data):
+        """Test that nodes are embedded in batches and ranked by similarity"""
+        embed_model = BagOfWordsEmbedding()
+        graph_rag = PatientGraphRAG(embed_model=embed_model, embed_batch_size=64)
+        graph_rag.add_patient(**sample_patient_data)
+        
+        results = graph_rag.search("Metformine", patient_id="TEST001", limit=3)
+        
+        assert embed_model.batch_calls == 1
+        assert results[0]["node"]["name"] == "Metformine 500mg"
+    
+    @pytest.mark.skipif(not GRAPH_RAG_AVAILABLE, reason="GraphRAG not available")
+    def test_load_legacy_graph_migrates_ids(self, tmp_path):
+        """Test that re-adding a patient to a legacy (MD5 id) graph does not duplicate nodes"""
+        import hashlib
+        import json
+        
+        def md5_id(node_type, patient_id, name):
+            return hashlib.md5(f"{node_type}:{patient_id}:{name}".encode()).hexdigest()[:12]
+        
+        def node(nid, node_type, name, data):
+            return {
+                "id": nid, "node_type": node_type, "name": name, "description": name,
+                "data": data, "created_at": "2025-01-01 10:00:00",
+                "updated_at": "2025-01-01 10:00:00", "source": "system", "embedding_text": "",
+            }
+        
+        timestamp = "2025-01-01T03:00:00"
+        patient_id = md5_id("patient", "", "P1")
+        condition_id = md5_id("condition", "P1", "HTA")
+        event_id = md5_id("event", "P1", f"desaturation_{timestamp}")
+        legacy = {
+            "nodes": {
+                patient_id: node(patient_id, "patient", "Jean", {"patient_id": "P1", "age": 70}),
+                condition_id: node(condition_id, "condition", "HTA", {}),
+                event_id: node(event_id, "event", "desaturation", {
+                    "event_type": "desaturation", "severity": "high", "timestamp": timestamp,
+                }),
+            },
+            "edges": [
+                [patient_id, condition_id, {"relation": "has_condition"}],
+                [patient_id, event_id, {"relation": "triggered_alert"}],
+            ],
+            "patients": {"P1": patient_id},
+        }
+        path = tmp_path / "graph.json"
+        path.write_text(json.dumps(legacy, indent=2), encoding="utf-8")
+        
+        graph_rag = PatientGraphRAG()
+        graph_rag.load(str(path))
+        graph_rag.add_patient("P1", "Jean", 70, conditions=["HTA"])
+        
+        assert graph_rag.get_statistics()["total_nodes"] == 3
+        context = graph_rag.get_patient_context("P1")
+        assert [c["name"] for c in context["conditions"]] == ["HTA"]
+        assert len(context["recent_events"]) == 1
+    
+    @pytest.mark.skipif(not GRAPH_RAG_AVAILABLE, reason="GraphRAG not available")
+    def test_search_batch_matches_search(self, graph_rag, sample_patient_data):
+        """Test that batched search returns what per-query search returns"""
+        graph_rag.add_patient(**sample_patient_data)
+        queries = ["Diabète", "Metformine", "Pénicilline"]
+        
+        fresh = PatientGraphRAG()
+        fresh.add_patient(**sample_patient_data)
+        
+        batched = graph_rag.search_batch(queries, ["TEST001", None, "TEST001"], limit=3)
+        single = [
+            fresh.search(query, patient_id=patient_id, limit=3)
+            for query, patient_id in zip(queries, ["TEST001", None, "TEST001"])
+        ]
+        
+        hits = lambda results: [[(r["node_id"], r["score"]) for r in rs] for rs in results]
+        assert hits(batched) == hits(single)
+    
+    @pytest.mark.skipif(not GRAPH_RAG_AVAILABLE, reason="GraphRAG not available")
+    def test_search_batch_matches_search_with_embed_model(self, sample_patient_data):
+        """Test that the matrix-product batch path returns what per-query search returns"""
+        second_patient = {
+            **sample_patient_data,
+            "patient_id": "TEST002",
+            "name": "Marie Curie",
+            "conditions": ["Asthme", "Diabète type 2"],
+            "medications": ["Salbutamol", "Metformine 850mg"],
+            "allergies": [],
+        }
+        queries = ["Diabète type 2", "Metformine", "Asthme Salbutamol", "Pénicilline allergie"]
+        patient_ids = ["TEST001", "TEST002", None, "TEST001"]
+        
+        graphs = []
+        for _ in range(2):
+            graph_rag = PatientGraphRAG(embed_model=BagOfWordsEmbedding())
+            graph_rag.add_patient(**sample_patient_data)
+            graph_rag.add_patient(**second_patient)
+            graphs.append(graph_rag)
+        batched_graph, single_graph = graphs
+        
+        batched = batched_graph.search_batch(queries, patient_ids, limit=3)
+        single = [
+            single_graph.search(query, patient_id=patient_id, limit=3)
+            for query, patient_id in zip(queries, patient_ids)
+        ]
+        
+        assert len(batched) == len(queries)
+        for batched_hits, single_hits in zip(batched, single):
+            assert [r["node_id"] for r in batched_hits] == [r["node_id"] for r in single_hits]
+            assert [r["score"] for r in batched_hits] == pytest.approx([r["score"] for r in single_hits])
+    
+    @pytest.mark.skipif(not GRAPH_RAG_AVAILABLE, reason="GraphRAG not available")
+    def test_flush_embeddings_async_batches(self, sample_patient_data):
+        """Test that async-capable models get concurrent, bounded batch calls"""
+        import asyncio
+        import numpy as np
+        
+        class AsyncEmbedding:
+            def __init__(self):
+                self.in_flight = 0
+                self.peak = 0
+            
+            async def aget_text_embedding_batch(self, texts):
+                self.in_flight += 1
+                self.peak = max(self.peak, self.in_flight)
+                await asyncio.sleep(0.01)
+                self.in_flight -= 1
+                return [np.ones(8, dtype=np.float32) for _ in texts]
+            
+            def get_text_embedding_batch(self, texts):
+                raise AssertionError("sync path used")
+        
+        embed_model = AsyncEmbedding()
+        graph_rag = PatientGraphRAG(embed_model=embed_model, embed_batch_size=100, embed_concurrency=2)
+        graph_rag.add_patient(**sample_patient_data)
+        graph_rag.embed_batch_size = 1
+        
+        embedded = graph_rag.flush_embeddings()
+        
+        assert embedded == len(graph_rag.nodes)
+        assert embed_model.peak == 2
 
 
 class TestLocalGraphStore:
@@ -203,6 +364,98 @@ class TestLocalGraphStore:
         # get_edges returns all edges, optionally filtered by node
         edges = store.get_edges(source_id="patient_P001")
         assert len(edges) > 0
+    
+    @pytest.mark.skipif(not STORE_AVAILABLE, reason="Store not available")
+    def test_batch_writes_once_on_exit(self, store, temp_dir):
+        """Test that batched writes are flushed when the batch exits"""
+        with store.batch():
+            for i in range(10):
+                store.save_node(f"event_{i}", {"node_type": "event"})
+            store.save_edge("event_0", "event_1", "followed_by")
+            assert not (Path(temp_dir) / "index.json").exists()
+        
+        reopened = LocalGraphStore(base_dir=temp_dir)
+        assert reopened.get_statistics()["node_count"] == 10
+        assert len(reopened.get_edges(relation="followed_by")) == 1
+        reopened.close()
+    
+    @pytest.mark.skipif(not STORE_AVAILABLE, reason="Store not available")
+    def test_batch_rolls_back_on_error(self, store, temp_dir):
+        """Test that a batch that raises leaves nothing persisted"""
+        store.save_node("patient_P001", {"name": "Patient", "node_type": "patient"})
+        
+        with pytest.raises(RuntimeError):
+            with store.batch():
+                store.save_node("event_1", {"node_type": "event"})
+                store.save_edge("patient_P001", "event_1", "occurred_during")
+                raise RuntimeError("ingest failed")
+        
+        assert store.load_node("event_1") is None
+        assert store.get_edges(source_id="patient_P001") == []
+        assert store.get_statistics()["node_count"] == 1
+        
+        reopened = LocalGraphStore(base_dir=temp_dir)
+        assert reopened.load_node("event_1") is None
+        assert reopened.get_statistics()["node_count"] == 1
+        reopened.close()
+    
+    @pytest.mark.skipif(not STORE_AVAILABLE, reason="Store not available")
+    def test_msgpack_node_round_trip(self, temp_dir):
+        """Test that nodes are stored as msgpack and decode back to the same payload"""
+        pytest.importorskip("msgpack")
+        from src.memory import graph_store
+        
+        node_data = {
+            "name": "Hypertension",
+            "node_type": "condition",
+            "data": {"severity": "moderate", "codes": ["I10"], "score": 0.5},
+        }
+        blob = graph_store._encode_node(node_data)
+        assert not blob.startswith(b"{")
+        assert graph_store._decode_node(blob) == node_data
+        
+        store = LocalGraphStore(base_dir=temp_dir)
+        store.save_node("condition_C001", node_data)
+        store.close()
+        reopened = LocalGraphStore(base_dir=temp_dir)
+        assert reopened.load_node("condition_C001") == node_data
+        reopened.close()
+    
+    @pytest.mark.skipif(not STORE_AVAILABLE, reason="Store not available")
+    def test_msgpack_node_without_msgpack(self, monkeypatch):
+        """Test that a msgpack blob read without msgpack installed fails with a clear error"""
+        from src.memory import graph_store
+        monkeypatch.setattr(graph_store, "MSGPACK_AVAILABLE", False)
+        
+        with pytest.raises(RuntimeError, match="condition_C001 is msgpack-encoded"):
+            graph_store._decode_node(b"\x81\xa4name\xa3HTA", "condition_C001")
+    
+    @pytest.mark.skipif(not STORE_AVAILABLE, reason="Store not available")
+    def test_storage_size_tracks_writes(self, store):
+        """Test that storage size follows node writes and deletes"""
+        store.save_node("event_1", {"name": "Small", "node_type": "event"})
+        small = store.get_statistics()["storage_size_bytes"]
+        
+        store.save_node("event_1", {"name": "Large " * 100, "node_type": "event"})
+        assert store.get_statistics()["storage_size_bytes"] > small
+        
+        store.delete_node("event_1")
+        assert store.get_statistics()["storage_size_bytes"] < small
+        
+    @pytest.mark.skipif(not STORE_AVAILABLE, reason="Store not available")
+    def test_migrates_legacy_json_nodes(self, temp_dir):
+        """Test that one-file-per-node JSON data is imported into the node database"""
+        import json
+        legacy_dir = Path(temp_dir) / "nodes"
+        legacy_dir.mkdir()
+        with open(legacy_dir / "patient_P001.json", "w", encoding="utf-8") as f:
+            json.dump({"name": "Legacy Patient", "node_type": "patient"}, f)
+        
+        store = LocalGraphStore(base_dir=temp_dir)
+        
+        assert store.load_node("patient_P001")["name"] == "Legacy Patient"
+        assert store.get_statistics()["node_count"] == 1
+        store.close()
 
 
 class TestGraphRetriever: